@@ -11,6 +11,7 @@ classes = [
     proximityjoin.SETUPAUTO_OT_proxjoin,
     singleuser.SETUPAUTO_OT_singleuser,
     duplicates2instances.SETUPAUTO_OT_dups2inst,
+    duplicates2instances.SETUPAUTO_OT_dups2inst_scan,
     ui.SETUPAUTO_PT_tools_panel
 ]
 
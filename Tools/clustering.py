@@ -0,0 +1,536 @@
+import numpy as np
+from math import floor
+
+
+
+# Clustering engine used by proximity join.
+# Kept free of bpy so it can be run and benchmarked outside of Blender.
+
+def connected_components(count, pairs_a, pairs_b):
+    """Label connected components of a graph given as two arrays of paired indices."""
+    labels = np.arange(count)
+    while True:
+        low = np.minimum(labels[pairs_a], labels[pairs_b])
+        previous = labels.copy()
+        np.minimum.at(labels, pairs_a, low)
+        np.minimum.at(labels, pairs_b, low)
+        # Pointer jumping, so long chains collapse in a few passes
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def labels_to_clusters(labels):
+    """Turn a component label per index into lists of indices, in order of first index."""
+    order = np.argsort(labels, kind='stable')
+    _, starts = np.unique(labels[order], return_index=True)
+    clusters = [group.tolist() for group in np.split(order, starts[1:])]
+    clusters.sort(key=lambda cluster: cluster[0])
+    return clusters
+
+
+# Cells have an edge of proximity / sqrt(3), so points sharing a cell are always close.
+# Shrunk a little so rounding never puts two points further apart than proximity in one cell
+CELL_SCALE = (1.0 - 1e-9) / np.sqrt(3.0)
+
+# Points within proximity are at most 2 such cells apart on every axis
+CELL_OFFSETS = [
+    (dx, dy, dz)
+    for dx in range(-2, 3)
+    for dy in range(-2, 3)
+    for dz in range(-2, 3)
+    if (dx, dy, dz) != (0, 0, 0)
+]
+
+# Half of them, so every pair of neighbouring cells is visited once
+HALF_CELL_OFFSETS = [offset for offset in CELL_OFFSETS if offset > (0, 0, 0)]
+
+# Most point pairs compared at once, bounding the memory of dense neighbourhoods
+CHUNK_PAIRS = 1 << 20
+
+
+def grid_cells(points, proximity, groups=None):
+    """Hash points into cells small enough that points sharing a cell are always close.
+
+    groups is an optional integer array, points of different groups never share or
+    neighbour a cell. Returns the cell id of every point, the integer cell coordinates of
+    every point, and the candidate pairs of neighbouring cells as two arrays of cell ids.
+    """
+    coordinates = np.floor(points.astype(np.float64) / (proximity * CELL_SCALE)).astype(np.int64)
+    # A margin of two cells keeps shifted keys from wrapping into the next row
+    cells = coordinates - (coordinates.min(axis=0) - 2)
+    dims = cells.max(axis=0) + 3
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    if groups is not None:
+        keys += np.asarray(groups, dtype=np.int64) * int(dims[0] * dims[1] * dims[2])
+
+    cell_keys, cell_of_point = np.unique(keys, return_inverse=True)
+    cell_of_point = cell_of_point.ravel()
+
+    pairs_a = []
+    pairs_b = []
+    for offset in HALF_CELL_OFFSETS:
+        target = cell_keys + (offset[0] * dims[1] + offset[1]) * dims[2] + offset[2]
+        found = np.minimum(np.searchsorted(cell_keys, target), len(cell_keys) - 1)
+        hit = cell_keys[found] == target
+        pairs_a.append(np.nonzero(hit)[0])
+        pairs_b.append(found[hit])
+
+    return cell_of_point, coordinates, np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+
+def any_close(points_a, points_b, proximity_sq, chunk=CHUNK_PAIRS):
+    """Check whether any point of a is within proximity of any point of b, in bounded blocks.
+
+    Blocks of the larger set start small and double, so crowded cells that touch stop early.
+    """
+    if len(points_a) < len(points_b):
+        points_a, points_b = points_b, points_a
+    max_rows = max(1, chunk // max(len(points_b), 1))
+    rows = min(64, max_rows)
+    start = 0
+    while start < len(points_a):
+        delta = points_a[start:start + rows, None, :] - points_b[None, :, :]
+        if (np.einsum('ijk,ijk->ij', delta, delta) <= proximity_sq).any():
+            return True
+        start += rows
+        rows = min(rows * 2, max_rows)
+    return False
+
+
+def link_cells(points, cell_of_point, pairs_a, pairs_b, proximity, labels=None, chunk=CHUNK_PAIRS):
+    """Find which candidate cell pairs hold at least one pair of points within proximity.
+
+    Point pairs are expanded and tested in batches of at most chunk pairs, so memory stays
+    bounded however many points crowd a cell. With labels, an array of cell component
+    labels, pairs already in one component are skipped and labels are merged in place,
+    which is all clustering needs. Returns a boolean mask over the candidate pairs.
+    """
+    linked = np.zeros(len(pairs_a), dtype=bool)
+    if not len(pairs_a):
+        return linked
+
+    order = np.argsort(cell_of_point, kind='stable')
+    sorted_points = points[order].astype(np.float64)
+    sizes = np.bincount(cell_of_point)
+    starts = np.cumsum(sizes) - sizes
+    work = sizes[pairs_a] * sizes[pairs_b]
+    proximity_sq = proximity * proximity
+
+    start = 0
+    while start < len(pairs_a):
+        end = start + max(1, int(np.searchsorted(np.cumsum(work[start:start + chunk]), chunk, side='right')))
+        batch = np.arange(start, end)
+        start = end
+
+        if labels is not None:
+            batch = batch[labels[pairs_a[batch]] != labels[pairs_b[batch]]]
+        if not len(batch):
+            continue
+
+        if len(batch) == 1 and work[batch[0]] > chunk:
+            # One pair of crowded cells, tested block by block until a close pair shows up
+            a = pairs_a[batch[0]]
+            b = pairs_b[batch[0]]
+            linked[batch[0]] = any_close(sorted_points[starts[a]:starts[a] + sizes[a]],
+                                         sorted_points[starts[b]:starts[b] + sizes[b]], proximity_sq, chunk)
+        else:
+            # Expand every cell pair into all pairs of their points
+            counts = work[batch]
+            pair = np.repeat(np.arange(len(batch)), counts)
+            ramp = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            size_b = sizes[pairs_b[batch]][pair]
+            index_a = starts[pairs_a[batch]][pair] + ramp // size_b
+            index_b = starts[pairs_b[batch]][pair] + ramp % size_b
+            delta = sorted_points[index_a] - sorted_points[index_b]
+            close = np.einsum('ij,ij->i', delta, delta) <= proximity_sq
+            linked[batch[np.unique(pair[close])]] = True
+
+        if labels is not None:
+            joined = batch[linked[batch]]
+            if len(joined):
+                merged = connected_components(len(labels), labels[pairs_a[joined]], labels[pairs_b[joined]])
+                labels[:] = merged[labels]
+
+    return linked
+
+
+def cluster_points(points, proximity):
+    """Group point indices into clusters of points chained closer than proximity.
+
+    Points are an (n, 3) array, already masked to the axes that should be considered.
+    Points sharing a grid cell are close by construction, so only neighbouring cells are
+    compared, and only until they are known to be in one cluster. The cost grows with the
+    number of points instead of the number of pairs, even when all points coincide.
+    """
+    if len(points) == 0:
+        return []
+
+    cell_of_point, _, pairs_a, pairs_b = grid_cells(points, proximity)
+    labels = np.arange(int(cell_of_point.max()) + 1)
+    link_cells(points, cell_of_point, pairs_a, pairs_b, proximity, labels)
+    return labels_to_clusters(labels[cell_of_point])
+
+
+class SpatialIndex:
+    """Grid of points kept between runs and updated incrementally.
+
+    Points are stored by cell, and cells small enough that points sharing one are always
+    close are linked when any of their points are close, so memory grows with the number
+    of points however densely they crowd. Entries are keyed by any hashable id with a
+    stamp, e.g. the object pointer and a hash of its transform, and an optional group
+    that keeps entries apart, e.g. their material set. Only cells around changed entries
+    are linked again, so re-running on a barely changed scene is cheap.
+    """
+
+    # Above this share of changed entries a full vectorized rebuild is faster
+    rebuild_ratio = 0.1
+
+    def __init__(self):
+        self.settings = None
+        self.points = {}
+        self.stamps = {}
+        self.cells = {}
+        self.grid = {}
+        self.links = {}
+
+    def clear(self):
+        self.points.clear()
+        self.stamps.clear()
+        self.cells.clear()
+        self.grid.clear()
+        self.links.clear()
+
+    def cell(self, point, group):
+        size = self.settings[0] * CELL_SCALE
+        return (group, floor(point[0] / size), floor(point[1] / size), floor(point[2] / size))
+
+    def discard(self, key):
+        """Remove an entry, returning the cell it was in, whose links must be tested again."""
+        if key not in self.points:
+            return None
+        cell = self.cells.pop(key)
+        del self.points[key]
+        del self.stamps[key]
+
+        members = self.grid[cell]
+        members.discard(key)
+        if not members:
+            del self.grid[cell]
+        return cell
+
+    def insert(self, key, point, stamp, group):
+        """Add an entry to its cell, returning the cell, whose links must be tested again."""
+        cell = self.cell(point, group)
+        self.points[key] = point
+        self.stamps[key] = stamp
+        self.cells[key] = cell
+        self.grid.setdefault(cell, set()).add(key)
+        self.links.setdefault(cell, set())
+        return cell
+
+    def cell_points(self, cell, arrays):
+        """Get the points of a cell as an array, built once per update in arrays."""
+        if cell not in arrays:
+            arrays[cell] = np.array([self.points[key] for key in self.grid[cell]], dtype=np.float64)
+        return arrays[cell]
+
+    def relink(self, cell, arrays):
+        """Test the links of a cell with each of its neighbouring cells again."""
+        for other in self.links.pop(cell, ()):
+            self.links[other].discard(cell)
+        if cell not in self.grid:
+            return
+
+        proximity_sq = self.settings[0] ** 2
+        group, cx, cy, cz = cell
+        points = self.cell_points(cell, arrays)
+        linked = set()
+
+        for dx, dy, dz in CELL_OFFSETS:
+            other = (group, cx + dx, cy + dy, cz + dz)
+            if other in self.grid and any_close(points, self.cell_points(other, arrays), proximity_sq):
+                linked.add(other)
+                self.links[other].add(cell)
+
+        self.links[cell] = linked
+
+    def rebuild(self, keys, points, stamps, groups):
+        """Replace the whole index using the vectorized cell search."""
+        self.clear()
+        if not len(keys):
+            return
+
+        group_ids = {}
+        group_array = np.array([group_ids.setdefault(group, len(group_ids)) for group in groups], dtype=np.int64)
+        cell_of_point, coordinates, pairs_a, pairs_b = grid_cells(points, self.settings[0], group_array)
+        linked = link_cells(points, cell_of_point, pairs_a, pairs_b, self.settings[0])
+
+        cell_names = [None] * (int(cell_of_point.max()) + 1)
+        for key, point, stamp, group, cell_id, (cx, cy, cz) in zip(keys, points.tolist(), stamps, groups,
+                                                                   cell_of_point.tolist(), coordinates.tolist()):
+            cell = (group, cx, cy, cz)
+            cell_names[cell_id] = cell
+            self.points[key] = tuple(point)
+            self.stamps[key] = stamp
+            self.cells[key] = cell
+            self.grid.setdefault(cell, set()).add(key)
+            self.links.setdefault(cell, set())
+
+        for a, b in zip(pairs_a[linked].tolist(), pairs_b[linked].tolist()):
+            self.links[cell_names[a]].add(cell_names[b])
+            self.links[cell_names[b]].add(cell_names[a])
+
+    def update(self, keys, points, stamps, settings, groups=None):
+        """Make the index hold exactly the given entries and return how many were re-inserted.
+
+        Entries not in keys, like deleted or deselected objects, are dropped. settings must
+        hold the proximity first, and anything else that changes the points, like the axis
+        mask. Changing it drops the whole index.
+        """
+        if groups is None:
+            groups = [None] * len(keys)
+        stamps = [(stamp, group) for stamp, group in zip(stamps, groups)]
+
+        if settings != self.settings:
+            self.settings = settings
+            self.clear()
+
+        current = set(keys)
+        removed = [key for key in self.points if key not in current]
+        dirty = [i for i, key in enumerate(keys) if self.stamps.get(key) != stamps[i]]
+        if len(dirty) + len(removed) > len(keys) * self.rebuild_ratio:
+            self.rebuild(keys, points, stamps, groups)
+            return len(keys)
+
+        touched = set()
+        for key in removed:
+            touched.add(self.discard(key))
+        for i in dirty:
+            touched.add(self.discard(keys[i]))
+            touched.add(self.insert(keys[i], tuple(points[i].tolist()), stamps[i], groups[i]))
+        touched.discard(None)
+
+        arrays = {}
+        for cell in touched:
+            self.relink(cell, arrays)
+        return len(dirty)
+
+    def clusters(self, keys):
+        """Group indexed keys into clusters of entries chained closer than proximity."""
+        if not keys:
+            return []
+
+        cell_ids = {cell: i for i, cell in enumerate(self.grid)}
+        pairs_a = [cell_ids[cell] for cell, linked in self.links.items() for _ in linked]
+        pairs_b = [cell_ids[other] for linked in self.links.values() for other in linked]
+        labels = connected_components(len(cell_ids), np.array(pairs_a, dtype=np.int64), np.array(pairs_b, dtype=np.int64))
+
+        key_labels = labels[np.fromiter((cell_ids[self.cells[key]] for key in keys), dtype=np.int64, count=len(keys))]
+        return [[keys[i] for i in cluster] for cluster in labels_to_clusters(key_labels)]
+
+
+def box_gap_sq(min_a, max_a, min_b, max_b):
+    """Return the squared distance between two axis aligned boxes, zero if they touch."""
+    gap_sq = 0.0
+    for axis in range(3):
+        gap = max(min_a[axis] - max_b[axis], min_b[axis] - max_a[axis], 0.0)
+        gap_sq += gap * gap
+    return gap_sq
+
+
+class AABBTree:
+    """Static bounding volume hierarchy over a list of axis aligned boxes.
+
+    Built top down by splitting the boxes at the median centre of the widest axis.
+    Nodes are stored as flat lists: (min, max, left, right, leaf indices).
+    """
+
+    leaf_size = 8
+
+    def __init__(self, mins, maxs):
+        self.mins = mins
+        self.maxs = maxs
+        self.nodes = []
+        if mins:
+            self.build(list(range(len(mins))))
+
+    def build(self, indices):
+        node_min = tuple(min(self.mins[i][axis] for i in indices) for axis in range(3))
+        node_max = tuple(max(self.maxs[i][axis] for i in indices) for axis in range(3))
+        node_index = len(self.nodes)
+        self.nodes.append([node_min, node_max, -1, -1, None])
+
+        if len(indices) <= self.leaf_size:
+            self.nodes[node_index][4] = indices
+            return node_index
+
+        # Split on the axis where box centres are spread the most
+        centres = {i: tuple(self.mins[i][axis] + self.maxs[i][axis] for axis in range(3)) for i in indices}
+        spread = [max(c[axis] for c in centres.values()) - min(c[axis] for c in centres.values()) for axis in range(3)]
+        axis = spread.index(max(spread))
+
+        if spread[axis] == 0.0:
+            self.nodes[node_index][4] = indices
+            return node_index
+
+        indices.sort(key=lambda i: centres[i][axis])
+        half = len(indices) // 2
+        self.nodes[node_index][2] = self.build(indices[:half])
+        self.nodes[node_index][3] = self.build(indices[half:])
+        return node_index
+
+    def query(self, query_min, query_max):
+        """Return indices of boxes overlapping the query box."""
+        found = []
+        if not self.nodes:
+            return found
+
+        stack = [0]
+        while stack:
+            node_min, node_max, left, right, leaf = self.nodes[stack.pop()]
+            if any(node_min[axis] > query_max[axis] or node_max[axis] < query_min[axis] for axis in range(3)):
+                continue
+            if leaf is None:
+                stack.append(left)
+                stack.append(right)
+                continue
+            for i in leaf:
+                box_min = self.mins[i]
+                box_max = self.maxs[i]
+                if all(box_min[axis] <= query_max[axis] and box_max[axis] >= query_min[axis] for axis in range(3)):
+                    found.append(i)
+        return found
+
+
+def cluster_boxes(mins, maxs, proximity, narrow_phase=None):
+    """Group box indices into clusters of boxes chained with gaps up to proximity.
+
+    Candidate pairs come from an AABB tree query with the box grown by proximity.
+    narrow_phase(a, b) is an optional extra test, called only for pairs whose box gap
+    is already within proximity, e.g. to measure the distance between actual meshes.
+    """
+    if not mins:
+        return []
+
+    tree = AABBTree(mins, maxs)
+    proximity_sq = proximity * proximity
+    visited = [False] * len(mins)
+    clusters = []
+
+    for start in range(len(mins)):
+        if visited[start]:
+            continue
+
+        visited[start] = True
+        cluster = [start]
+        to_check = [start]
+
+        while to_check:
+            current = to_check.pop()
+            current_min = mins[current]
+            current_max = maxs[current]
+            query_min = tuple(value - proximity for value in current_min)
+            query_max = tuple(value + proximity for value in current_max)
+
+            for other in tree.query(query_min, query_max):
+                if visited[other]:
+                    continue
+                if box_gap_sq(current_min, current_max, mins[other], maxs[other]) > proximity_sq:
+                    continue
+                if narrow_phase and not narrow_phase(current, other):
+                    continue
+                visited[other] = True
+                cluster.append(other)
+                to_check.append(other)
+
+        clusters.append(cluster)
+
+    return clusters
+
+
+def split_clusters(clusters, mins, maxs, weights, max_extent=0.0, max_weight=0):
+    """Split clusters until each fits within max_extent and max_weight, zero meaning no limit.
+
+    mins and maxs are (n, 3) arrays of member bounding boxes and weights an (n,) array, e.g.
+    vertex counts. A cluster over a limit is cut in two at the median centre of its longest
+    axis, recursively, so the pieces stay spatially compact.
+    """
+    centres = (mins + maxs) * 0.5
+    result = []
+    pending = [np.asarray(cluster) for cluster in clusters]
+
+    while pending:
+        cluster = pending.pop()
+        extent = maxs[cluster].max(axis=0) - mins[cluster].min(axis=0)
+        too_big = max_extent > 0.0 and extent.max() > max_extent
+        too_heavy = max_weight > 0 and weights[cluster].sum() > max_weight
+
+        if len(cluster) < 2 or not (too_big or too_heavy):
+            result.append(cluster.tolist())
+            continue
+
+        axis = int(np.argmax(extent))
+        order = cluster[np.argsort(centres[cluster, axis], kind='stable')]
+        half = len(order) // 2
+        pending.append(order[half:])
+        pending.append(order[:half])
+
+    result.sort(key=lambda cluster: min(cluster))
+    return result
+
+
+def benchmark(sizes=(1000, 10000, 100000), proximity=1.5, density=0.2, seed=0):
+    """Time the engine on random point clouds of growing size and print the results.
+
+    Density is the average number of points per cubic unit, kept constant across sizes
+    so the timings show how the engine scales with object count. Every size also runs
+    with all points at one spot, like a CAD import with every origin at the world origin.
+    SpatialIndex is timed as proximity join uses it: a full build, then an update after
+    moving one percent of the points.
+    """
+    import time
+
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for size in sizes:
+        side = (size / density) ** (1.0 / 3.0)
+        clouds = {
+            "random": rng.uniform(0, side, (size, 3)).astype(np.float32),
+            "coincident": np.zeros((size, 3), dtype=np.float32),
+        }
+
+        for name, points in clouds.items():
+            timings = {}
+            keys = list(range(size))
+
+            start = time.perf_counter()
+            clusters = cluster_points(points, proximity)
+            timings['cluster_points'] = time.perf_counter() - start
+
+            index = SpatialIndex()
+            start = time.perf_counter()
+            index.update(keys, points, [b""] * size, (proximity,))
+            index.clusters(keys)
+            timings['index build'] = time.perf_counter() - start
+
+            moved = rng.choice(size, max(size // 100, 1), replace=False)
+            points = points.copy()
+            points[moved] += rng.uniform(-proximity, proximity, (len(moved), 3)).astype(np.float32)
+            stamps = [b""] * size
+            for i in moved.tolist():
+                stamps[i] = b"moved"
+            start = time.perf_counter()
+            index.update(keys, points, stamps, (proximity,))
+            index.clusters(keys)
+            timings['index update'] = time.perf_counter() - start
+
+            results.append((size, name, timings))
+            print(f"{size} {name} points, {len(clusters)} clusters: " + ", ".join(f"{label} {seconds:.3f}s" for label, seconds in timings.items()))
+
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,5 +1,10 @@
 import bpy
+import time
 import hashlib
+import numpy as np
+from mathutils import Matrix
+
+from . import fingerprint, meshjoin
 
 
 
@@ -17,6 +22,7 @@ class SETUPAUTO_OT_dups2inst(bpy.types.Operator):
         items = [
         ('BOX', "Bounding Box", "Use bounding box"),
         ('FULL', "Full Topology", "Use Full Topology"),
+        ('CANONICAL', "Transform Invariant", "Match meshes even if their transform was baked into the vertices, then move linked copies into place"),
         ],
         default = 'BOX'
     )
@@ -29,6 +35,71 @@ class SETUPAUTO_OT_dups2inst(bpy.types.Operator):
         max = 7
     )
 
+    use_tolerance : bpy.props.BoolProperty(
+        name = "Use Tolerance",
+        description = "Full Topology only. Match vertex positions within a tolerance instead of rounding them, so values close to a rounding boundary still match. Slower.",
+        default = False
+    )
+
+    tolerance : bpy.props.FloatProperty(
+        name = "Tolerance",
+        description = "Largest difference allowed between matching vertex coordinates.",
+        default = 0.001,
+        min = 0.0,
+        precision = 5
+    )
+
+    any_vertex_order : bpy.props.BoolProperty(
+        name = "Any Vertex Order",
+        description = "With tolerance, also match meshes whose vertices are stored in a different order. Slower.",
+        default = False
+    )
+
+    use_cache : bpy.props.BoolProperty(
+        name = "Use Cache",
+        description = "Store fingerprints on each mesh, saved with the file, so unchanged meshes are not hashed again on later runs.",
+        default = True
+    )
+
+    use_uvs : bpy.props.BoolProperty(
+        name = "Compare UVs",
+        description = "Full Topology only. Only link meshes whose UV maps match too, so textures keep their mapping. Slower.",
+        default = False
+    )
+
+    use_face_materials : bpy.props.BoolProperty(
+        name = "Compare Face Materials",
+        description = "Full Topology only. Only link meshes whose faces use the same material slots.",
+        default = False
+    )
+
+    use_threads : bpy.props.BoolProperty(
+        name = "Use All Cores",
+        description = "Full Topology only. Hash meshes on worker threads while Blender reads the next mesh.",
+        default = True
+    )
+
+    link_method : bpy.props.EnumProperty(
+        name = "Link Method",
+        description = "How matching objects are linked.",
+        items = [
+        ('DATA', "Data", "Assign the shared mesh to each object directly"),
+        ('OPERATOR', "Operator", "Run Blender's link data operator once per group"),
+        ],
+        default = 'DATA'
+    )
+
+    output_mode : bpy.props.EnumProperty(
+        name = "Output",
+        description = "What duplicates are turned into.",
+        items = [
+        ('LINK', "Linked Data", "Keep every object, sharing one mesh per group"),
+        ('COLLECTION', "Collection Instances", "Replace each group with empties instancing one source collection"),
+        ('POINTS', "Point Instances", "Replace each group with one geometry nodes point cloud instancing one source collection"),
+        ],
+        default = 'LINK'
+    )
+
     rename : bpy.props.BoolProperty(
         name = "Rename",
         description = "Rename linked objects",
@@ -41,18 +112,350 @@ class SETUPAUTO_OT_dups2inst(bpy.types.Operator):
     def mesh_hash(self, context, obj):
         mesh = obj.data
         
-        if self.mode == 'BOX':
-            # Use bounding box dimensions for comparison
-            dimensions = tuple(round(d, self.accuracy) for d in obj.dimensions)
-            materials = tuple(mat.name if mat else "None" for mat in mesh.materials)
-            return hashlib.md5(str((dimensions, materials)).encode()).hexdigest()
-        elif self.mode == 'FULL':
-            # Full topology mode - use all vertex positions
-            verts = tuple(round(v.co.x, self.accuracy) for v in mesh.vertices) + \
-                    tuple(round(v.co.y, self.accuracy) for v in mesh.vertices) + \
-                    tuple(round(v.co.z, self.accuracy) for v in mesh.vertices)
-            materials = tuple(mat.name if mat else "None" for mat in mesh.materials)
-            return hashlib.md5(str((verts, materials)).encode()).hexdigest()
+        # Use bounding box dimensions for comparison
+        dimensions = tuple(round(d, self.accuracy) for d in obj.dimensions)
+        materials = tuple(mat.name if mat else "None" for mat in mesh.materials)
+        return hashlib.md5(str((dimensions, materials)).encode()).hexdigest()
+
+
+    def report_stages(self, stats):
+        """Print how many meshes each matching stage removed and how long it took."""
+        for name, removed, seconds in stats:
+            print(f"Duplicates to instances, {name}: removed {removed} meshes in {seconds:.3f}s")
+        self.report({'INFO'}, "Stages: " + ", ".join(f"{name} -{removed} ({seconds:.2f}s)" for name, removed, seconds in stats))
+
+
+    def fingerprint(self, mesh, name, compute):
+        """Compute a fingerprint, going through the cache stored on the mesh when enabled."""
+        if self.use_cache:
+            return fingerprint.cached_fingerprint(mesh, name, compute)
+        return compute(mesh)
+
+
+    def full_groups(self, objects):
+        """Group objects whose meshes have the same vertex positions.
+
+        The full hash is only computed for meshes that survive cheaper stages: element counts
+        and materials, bounding box size, then a hash of sampled vertices.
+        """
+        users = {}
+        for obj in objects:
+            users.setdefault(obj.data, []).append(obj)
+
+        name = f"full_{self.accuracy}_{int(self.use_uvs)}{int(self.use_face_materials)}"
+        computed = {}
+
+        def prepare(meshes):
+            # Hash every mesh without a valid stored fingerprint in one parallel batch
+            if not self.use_threads:
+                return
+            if self.use_cache:
+                meshes = [mesh for mesh in meshes if fingerprint.stored_fingerprint(mesh, name) is None]
+            computed.update(fingerprint.full_fingerprints(meshes, self.accuracy, self.use_uvs, self.use_face_materials))
+
+        def full_hash(mesh):
+            if mesh in computed:
+                return computed[mesh]
+            return fingerprint.full_fingerprint(mesh, self.accuracy, self.use_uvs, self.use_face_materials)
+
+        buckets, stats = fingerprint.run_stages([list(users)], [
+            ("counts", fingerprint.count_signature),
+            ("bounds", lambda mesh: fingerprint.bounds_signature(users[mesh][0], self.accuracy)),
+            ("sampled hash", lambda mesh: fingerprint.sampled_fingerprint(mesh, self.accuracy)),
+            ("full hash", lambda mesh: self.fingerprint(mesh, name, full_hash), prepare),
+        ])
+        self.report_stages(stats)
+
+        return [[obj for mesh in bucket for obj in users[mesh]] for bucket in buckets]
+
+
+    def link_transform_invariant(self, objects):
+        """Link meshes that are rigidly moved copies of each other, keeping every object in place.
+
+        Meshes go through filters from cheap to expensive: element counts, then surface area and
+        edge lengths, then vertex positions in their principal axes pose. Only meshes sharing a
+        bucket after every stage are linked.
+        """
+        users = {}
+        for obj in objects:
+            users.setdefault(obj.data, []).append(obj)
+
+        coordinates = {}
+        poses = {}
+
+        def co(mesh):
+            if mesh not in coordinates:
+                coordinates[mesh] = fingerprint.read_coordinates(mesh)
+            return coordinates[mesh]
+
+        def pose(mesh):
+            if mesh not in poses:
+                poses[mesh] = fingerprint.canonical_pose(co(mesh))
+            return poses[mesh]
+
+        buckets, stats = fingerprint.run_stages([[mesh for mesh in users if len(mesh.vertices) > 0]], [
+            ("counts", fingerprint.count_signature),
+            ("shape", lambda mesh: fingerprint.shape_signature(mesh, co(mesh), self.accuracy)),
+            ("canonical pose", lambda mesh: self.fingerprint(mesh, f"canonical_{self.accuracy}",
+                                                             lambda mesh: fingerprint.canonical_signature(co(mesh), pose(mesh), self.accuracy))),
+        ])
+        self.report_stages(stats)
+
+        linked = 0
+        skipped = 0
+        groups = []
+        for bucket in buckets:
+            source = bucket[0]
+            group = list(users[source])
+            for mesh in bucket[1:]:
+                # The source mesh moved by this matrix lands where the old mesh was
+                offset = Matrix(fingerprint.rigid_transform(pose(source), pose(mesh)).tolist())
+                offset_inverse = offset.inverted()
+                for obj in users[mesh]:
+                    # Modifiers like Mirror and Array work in the object's frame, moving it changes their result
+                    if obj.modifiers:
+                        skipped += 1
+                        continue
+
+                    obj.matrix_world = obj.matrix_world @ offset
+                    # Children keep their place by undoing the offset in their parent inverse
+                    for child in obj.children:
+                        child.matrix_parent_inverse = offset_inverse @ child.matrix_parent_inverse
+                    obj.data = source
+                    group.append(obj)
+                    linked += 1
+            if len(group) > 1:
+                groups.append(group)
+
+        if skipped:
+            self.report({'INFO'}, f"Kept {skipped} objects with modifiers on their own mesh, moving them would change the modifier result.")
+
+        return linked, groups
+
+
+    def tolerance_groups(self, objects):
+        """Group objects whose meshes match within the tolerance.
+
+        Meshes are bucketed by element counts and materials, which never suffer from rounding.
+        Inside a bucket each mesh is compared with the first mesh of every group found so far,
+        on bounding box size first, then on all vertex positions.
+        """
+        users = {}
+        for obj in objects:
+            users.setdefault(obj.data, []).append(obj)
+
+        stages = [("counts", fingerprint.count_signature)]
+        if self.use_face_materials:
+            stages.append(("face materials", lambda mesh: fingerprint.hash_buffers(fingerprint.read_face_materials(mesh))))
+        buckets, stats = fingerprint.run_stages([list(users)], stages)
+        self.report_stages(stats)
+
+        # KD trees for Any Vertex Order, built once per mesh however many groups it is compared with
+        trees = {}
+
+        def tree(mesh, co):
+            if mesh not in trees:
+                trees[mesh] = fingerprint.build_kdtree(co)
+            return trees[mesh]
+
+        groups = []
+        for bucket in buckets:
+            found = []
+            for mesh in bucket:
+                co = fingerprint.read_coordinates(mesh)
+                uvs = fingerprint.read_uvs(mesh) if self.use_uvs else None
+                size = np.ptp(co, axis=0) if len(co) else np.zeros(3, dtype=np.float32)
+                for group in found:
+                    if np.abs(group[1] - size).max() > 2 * self.tolerance:
+                        continue
+                    if uvs is not None and not fingerprint.within_tolerance(group[3], uvs, self.tolerance):
+                        continue
+                    if self.any_vertex_order:
+                        matched = fingerprint.within_tolerance(group[0], co, self.tolerance, True,
+                                                               tree(group[2][0], group[0]), tree(mesh, co))
+                    else:
+                        matched = fingerprint.within_tolerance(group[0], co, self.tolerance)
+                    if matched:
+                        group[2].append(mesh)
+                        break
+                else:
+                    found.append((co, size, [mesh], uvs))
+            groups.extend(group[2] for group in found if len(group[2]) > 1)
+
+        return [[obj for mesh in group for obj in users[mesh]] for group in groups]
+
+
+    def report_quality(self, groups, objects):
+        """Report match quality when objects carry a ground truth "setupauto_duplicate_id" property."""
+        truth = {obj: obj["setupauto_duplicate_id"] for obj in objects if "setupauto_duplicate_id" in obj}
+        if not truth:
+            return
+        precision, recall = fingerprint.match_quality(groups, truth)
+        self.report({'INFO'}, f"Match quality against ground truth: precision {precision:.3f}, recall {recall:.3f}")
+
+
+    def link_groups(self, groups):
+        """Point every object of a group at the group's first mesh."""
+        linked = 0
+        for group in groups:
+            source = group[0].data
+            for obj in group:
+                if obj.data != source:
+                    obj.data = source
+                    linked += 1
+        return linked
+
+
+    def link_with_operator(self, context, groups):
+        """Link groups with make_links_data, kept to compare against direct linking."""
+        linked = 0
+        for list in groups:
+            bpy.ops.object.select_all(action='DESELECT')
+            for obj in list:
+                obj.select_set(True)
+            context.view_layer.objects.active = list[0]
+            bpy.ops.object.make_links_data(type='OBDATA')
+            linked += len(list) - 1
+        return linked
+
+
+    def free_orphans(self, meshes):
+        """Remove meshes left without users in one batch, returning the vertices and loops freed."""
+        orphans = [mesh for mesh in meshes if mesh.users == 0]
+        freed_vertices = sum(len(mesh.vertices) for mesh in orphans)
+        freed_loops = sum(len(mesh.loops) for mesh in orphans)
+        bpy.data.batch_remove(orphans)
+        return freed_vertices, freed_loops
+
+
+    def depsgraph_time(self, context):
+        """Time a full re-evaluation of every object in the view layer."""
+        for obj in context.view_layer.objects:
+            obj.update_tag(refresh={'OBJECT'})
+        start = time.perf_counter()
+        context.view_layer.update()
+        return time.perf_counter() - start
+
+
+    def sources_collection(self, context):
+        """Get the collection holding instance sources, hidden from the view layer."""
+        name = "SetupAuto Instance Sources"
+        sources = bpy.data.collections.get(name)
+        if sources is None:
+            sources = bpy.data.collections.new(name)
+        if name not in context.scene.collection.children:
+            context.scene.collection.children.link(sources)
+        context.view_layer.layer_collection.children[name].exclude = True
+        return sources
+
+
+    def point_instancer(self):
+        """Get the geometry nodes group instancing a collection on every point of a mesh.
+
+        Points carry "rotation" (euler) and "scale" attributes with each instance's transform.
+        """
+        name = "SetupAuto Point Instancer"
+        node_group = bpy.data.node_groups.get(name)
+        if node_group is not None:
+            return node_group
+
+        node_group = bpy.data.node_groups.new(name, 'GeometryNodeTree')
+        node_group.interface.new_socket(name="Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        node_group.interface.new_socket(name="Collection", in_out='INPUT', socket_type='NodeSocketCollection')
+        node_group.interface.new_socket(name="Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+
+        nodes = node_group.nodes
+        links = node_group.links
+        group_input = nodes.new('NodeGroupInput')
+        group_output = nodes.new('NodeGroupOutput')
+        collection_info = nodes.new('GeometryNodeCollectionInfo')
+        collection_info.transform_space = 'ORIGINAL'
+        collection_info.inputs['Reset Children'].default_value = True
+        instancer = nodes.new('GeometryNodeInstanceOnPoints')
+        rotation = nodes.new('GeometryNodeInputNamedAttribute')
+        rotation.data_type = 'FLOAT_VECTOR'
+        rotation.inputs['Name'].default_value = "rotation"
+        scale = nodes.new('GeometryNodeInputNamedAttribute')
+        scale.data_type = 'FLOAT_VECTOR'
+        scale.inputs['Name'].default_value = "scale"
+
+        links.new(group_input.outputs['Collection'], collection_info.inputs['Collection'])
+        links.new(group_input.outputs['Geometry'], instancer.inputs['Points'])
+        links.new(collection_info.outputs[0], instancer.inputs['Instance'])
+        links.new(rotation.outputs['Attribute'], instancer.inputs['Rotation'])
+        links.new(scale.outputs['Attribute'], instancer.inputs['Scale'])
+        links.new(instancer.outputs['Instances'], group_output.inputs['Geometry'])
+
+        return node_group
+
+
+    def can_convert(self, obj):
+        """Check that an object is fully described by its mesh and transform."""
+        return (not obj.children
+                and obj.parent is None
+                and not obj.modifiers
+                and all(slot.link == 'DATA' for slot in obj.material_slots))
+
+
+    def convert_groups(self, context, groups):
+        """Replace every group of linked objects by instances of one source collection.
+
+        Returns how many linked objects were kept as they are.
+        """
+        sources = self.sources_collection(context)
+        removed = []
+        renames = []
+        kept = 0
+
+        for group in groups:
+            # The source only carries the mesh. Parents, children, and objects with modifiers or
+            # object linked materials stay as they are, instancing would lose what they add
+            members = [obj for obj in group if self.can_convert(obj)]
+            kept += len(group) - len(members)
+            if len(members) < 2:
+                kept += len(members)
+                continue
+
+            mesh = members[0].data
+            collection = bpy.data.collections.new(mesh.name)
+            sources.children.link(collection)
+            source = bpy.data.objects.new(mesh.name, mesh)
+            collection.objects.link(source)
+            target_collection = members[0].users_collection[0]
+
+            if self.output_mode == 'COLLECTION':
+                for obj in members:
+                    empty = bpy.data.objects.new(obj.name, None)
+                    renames.append((empty, obj.name))
+                    empty.instance_type = 'COLLECTION'
+                    empty.instance_collection = collection
+                    empty.matrix_world = obj.matrix_world.copy()
+                    obj.users_collection[0].objects.link(empty)
+
+            else:
+                decomposed = [obj.matrix_world.decompose() for obj in members]
+                points = bpy.data.meshes.new(mesh.name + "_points")
+                points.vertices.add(len(members))
+                points.vertices.foreach_set("co", np.array([location for location, _, _ in decomposed], dtype=np.float32).ravel())
+                rotation = points.attributes.new("rotation", 'FLOAT_VECTOR', 'POINT')
+                rotation.data.foreach_set("vector", np.array([quat.to_euler() for _, quat, _ in decomposed], dtype=np.float32).ravel())
+                scale = points.attributes.new("scale", 'FLOAT_VECTOR', 'POINT')
+                scale.data.foreach_set("vector", np.array([size for _, _, size in decomposed], dtype=np.float32).ravel())
+
+                instancer = bpy.data.objects.new(mesh.name + "_instances", points)
+                target_collection.objects.link(instancer)
+                modifier = instancer.modifiers.new("Instances", 'NODES')
+                modifier.node_group = self.point_instancer()
+                modifier[modifier.node_group.interface.items_tree['Collection'].identifier] = collection
+
+            removed.extend(members)
+
+        bpy.data.batch_remove(removed)
+
+        # Empties were created while their objects still held the names
+        for empty, name in renames:
+            empty.name = name
+        return kept
 
 
     def execute(self, context):
@@ -62,26 +465,49 @@ class SETUPAUTO_OT_dups2inst(bpy.types.Operator):
             self.report({'INFO'}, "You need to select two or more objects.")
             return {'CANCELLED'}
 
-        seen = {}
-        for obj in selected:
-            if obj.type != 'MESH':
-                continue
-            key = self.mesh_hash(context, obj)
-            if key not in seen:
-                seen[key] = [obj]
+        mesh_objects = [obj for obj in selected if obj.type == 'MESH']
+        old_meshes = {obj.data for obj in mesh_objects}
+
+        start = time.perf_counter()
+        if self.mode == 'CANONICAL':
+            linked, groups = self.link_transform_invariant(mesh_objects)
+        else:
+            if self.mode == 'FULL' and self.use_tolerance:
+                groups = self.tolerance_groups(mesh_objects)
+            elif self.mode == 'FULL':
+                groups = self.full_groups(mesh_objects)
             else:
-                list = seen[key]
-                list.append(obj)
+                seen = {}
+                for obj in mesh_objects:
+                    seen.setdefault(self.mesh_hash(context, obj), []).append(obj)
+                groups = list(seen.values())
 
-        for key in seen:
-            bpy.ops.object.select_all(action='DESELECT')
-            list = seen[key]
-            for obj in list:
-                obj.select_set(True)
-            bpy.context.view_layer.objects.active = list[0]
-            bpy.ops.object.make_links_data(type='OBDATA')
+            self.report_quality(groups, mesh_objects)
+
+            # A group of one has nothing to link to
+            groups = [group for group in groups if len(group) > 1]
+            if self.link_method == 'DATA':
+                linked = self.link_groups(groups)
+            else:
+                linked = self.link_with_operator(context, groups)
+
+        freed_vertices, freed_loops = self.free_orphans(old_meshes)
+        elapsed = time.perf_counter() - start
+
+        if self.output_mode != 'LINK':
+            objects_before = len(bpy.data.objects)
+            depsgraph_before = self.depsgraph_time(context)
 
-        self.report({'INFO'},"Finished linking" + str(len(selected)) + " objects!")
+            kept = self.convert_groups(context, groups)
+
+            objects_after = len(bpy.data.objects)
+            depsgraph_after = self.depsgraph_time(context)
+            self.report({'INFO'}, f"Objects: {objects_before} -> {objects_after}, "
+                        f"depsgraph evaluation: {depsgraph_before:.3f}s -> {depsgraph_after:.3f}s. "
+                        f"Kept {kept} linked objects with parents, children, modifiers or object materials.")
+
+        self.report({'INFO'}, f"Finished linking {linked} objects in {elapsed:.2f}s ({self.link_method.lower()} link). "
+                    f"Freed {freed_vertices} vertices and {freed_loops} face corners.")
         return {'FINISHED'}
     
 
@@ -93,8 +519,214 @@ class SETUPAUTO_OT_dups2inst(bpy.types.Operator):
         layout = self.layout
         layout.label(text = "'BOX': Less accurate, easier to link data.", icon = 'INFO')
         layout.label(text = "'FULL': More accurate, harder to link data.", icon = 'INFO')
+        layout.label(text = "'TRANSFORM INVARIANT': Finds moved and rotated copies, slower.", icon = 'INFO')
 
         layout.prop(self, 'mode', text = "Mode")
+        layout.prop(self, 'output_mode', text = "Output")
         layout.prop(self, 'accuracy', text = "Accuracy")
+        if self.mode != 'BOX':
+            layout.prop(self, 'use_cache', text = "Use Cache")
+        if self.mode != 'CANONICAL':
+            layout.prop(self, 'link_method', text = "Link Method")
+        if self.mode == 'FULL':
+            layout.prop(self, 'use_uvs', text = "Compare UVs")
+            layout.prop(self, 'use_face_materials', text = "Compare Face Materials")
+            layout.prop(self, 'use_threads', text = "Use All Cores")
+            layout.prop(self, 'use_tolerance', text = "Use Tolerance")
+            if self.use_tolerance:
+                layout.prop(self, 'tolerance', text = "Tolerance")
+                layout.prop(self, 'any_vertex_order', text = "Any Vertex Order")
         layout.prop(self, 'rename', text = "Rename")
         layout.prop(self, 'new_name', text = "New Name")
+
+
+
+class SETUPAUTO_OT_dups2inst_scan(bpy.types.Operator):
+    '''Class scans a whole collection for duplicates without freezing the interface'''
+    bl_idname = "setupauto.ot_dups2inst_scan"
+    bl_label = "scan duplicates"
+    bl_description = "Operator scans all mesh objects of the chosen collection in small time slices, linking objects data together if the topology is the same. Press Esc to cancel."
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # Seconds of work per timer tick, short enough to keep the interface responsive
+    slice_time = 0.05
+
+    accuracy : bpy.props.IntProperty(
+        name = "Floating Point Accuracy", 
+        description = "Accurate of the vertex positions when comparing meshes; Or: how many numbers after decimal point. Higher number is more accurate, but slower.", 
+        default = 2, 
+        min = 1, 
+        max = 7
+    )
+
+    link : bpy.props.BoolProperty(
+        name = "Link Duplicates",
+        description = "Link the duplicates found when the scan finishes. Disable to only get the summary.",
+        default = True
+    )
+
+
+    def sample_key(self, mesh):
+        return (fingerprint.count_signature(mesh), fingerprint.sampled_fingerprint(mesh, self.accuracy))
+
+
+    def full_key(self, mesh):
+        return (fingerprint.count_signature(mesh),
+                fingerprint.cached_fingerprint(mesh, f"full_{self.accuracy}_00",
+                                               lambda mesh: fingerprint.full_fingerprint(mesh, self.accuracy)))
+
+
+    def next_phase(self):
+        """Turn keys of the finished phase into buckets, and queue the members for the next phase."""
+        buckets = {}
+        for mesh, key in self.keys.items():
+            buckets.setdefault(key, []).append(mesh)
+        self.buckets = [bucket for bucket in buckets.values() if len(bucket) > 1]
+
+        self.keys = {}
+        self.pending = [mesh for bucket in self.buckets for mesh in bucket]
+        self.total = self.done + len(self.pending)
+
+
+    def data_stamp(self):
+        """Cheap stamp of the blend data, changing when objects or meshes are added or removed."""
+        return (len(bpy.data.objects), len(bpy.data.meshes))
+
+
+    def data_changed(self, full=False):
+        """Check whether the objects and meshes held between ticks may no longer be valid.
+
+        Every tick only checks for undo and changed datablock counts. With full, every held
+        reference is also touched, done once before linking.
+        """
+        if self.undone or self.data_stamp() != self.stamp:
+            return True
+        if not full:
+            return False
+        try:
+            for mesh, objects in self.users.items():
+                mesh.name
+                for obj in objects:
+                    if obj.data != mesh:
+                        return True
+        except ReferenceError:
+            return True
+        return False
+
+
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+
+        for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+            if self.on_undo in handlers:
+                handlers.remove(self.on_undo)
+
+
+    def cancel(self, context):
+        # Blender cancelled the scan, e.g. on file load or closing the window
+        self.finish(context)
+
+
+    def cancel_changed(self, context):
+        self.finish(context)
+        self.report({'WARNING'}, "Objects or meshes changed during the duplicate scan, scan cancelled. Run it again.")
+        return {'CANCELLED'}
+
+
+    def summarize(self, context):
+        """Report the groups found and link them."""
+        groups = [[obj for mesh in bucket for obj in self.users[mesh]] for bucket in self.buckets]
+        largest = max((len(group) for group in groups), default=0)
+        saved = sum(meshjoin.mesh_memory(mesh) for bucket in self.buckets for mesh in bucket[1:])
+
+        linked = 0
+        if self.link:
+            for bucket in self.buckets:
+                for mesh in bucket[1:]:
+                    for obj in self.users[mesh]:
+                        obj.data = bucket[0]
+                        linked += 1
+            bpy.data.batch_remove([mesh for bucket in self.buckets for mesh in bucket[1:] if mesh.users == 0])
+
+        self.report({'INFO'}, f"Scanned {len(self.users)} meshes: {len(groups)} duplicate groups, largest has {largest} objects, "
+                    f"about {saved / 1048576:.1f} MB of mesh data {'freed' if self.link else 'could be freed'}, {linked} objects linked.")
+
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.finish(context)
+            self.report({'INFO'}, "Duplicate scan cancelled, no objects were linked. Fingerprints computed so far stay stored on their meshes.")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # The interface stays usable during the scan, deleting objects or undoing invalidates what is held
+        if self.data_changed():
+            return self.cancel_changed(context)
+
+        key_function = self.sample_key if self.phase == 'SAMPLE' else self.full_key
+        deadline = time.perf_counter() + self.slice_time
+        try:
+            while self.pending and time.perf_counter() < deadline:
+                mesh = self.pending.pop()
+                self.keys[mesh] = key_function(mesh)
+                self.done += 1
+        except ReferenceError:
+            return self.cancel_changed(context)
+
+        context.window_manager.progress_update(int(self.done * 100 / max(self.total, 1)))
+
+        if self.pending:
+            return {'RUNNING_MODAL'}
+
+        self.next_phase()
+        if self.phase == 'SAMPLE':
+            # Cheap counts and sampled vertices first, full hashes only for what is left
+            self.phase = 'FULL'
+            return {'RUNNING_MODAL'}
+
+        if self.data_changed(full=True):
+            return self.cancel_changed(context)
+
+        self.finish(context)
+        self.summarize(context)
+        return {'FINISHED'}
+
+
+    def invoke(self, context, event):
+        collection = context.scene.tools_props.scan_collection
+
+        if not collection:
+            self.report({'INFO'}, "Please choose a collection to scan.")
+            return {'CANCELLED'}
+
+        self.users = {}
+        for obj in collection.all_objects:
+            if obj.type == 'MESH':
+                self.users.setdefault(obj.data, []).append(obj)
+
+        self.phase = 'SAMPLE'
+        self.keys = {}
+        self.buckets = []
+        self.pending = list(self.users)
+        self.done = 0
+        self.total = len(self.pending)
+
+        self.stamp = self.data_stamp()
+        self.undone = False
+
+        def on_undo(*args):
+            self.undone = True
+
+        self.on_undo = on_undo
+        bpy.app.handlers.undo_post.append(on_undo)
+        bpy.app.handlers.redo_post.append(on_undo)
+
+        wm = context.window_manager
+        wm.progress_begin(0, 100)
+        self.timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
@@ -0,0 +1,318 @@
+import os
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from mathutils.kdtree import KDTree
+
+
+
+# Mesh fingerprint engine used by duplicates to instances.
+# Reads mesh buffers in bulk with foreach_get and hashes the raw bytes of the quantized arrays.
+
+def read_coordinates(mesh):
+    """Read vertex coordinates of a mesh into an (n, 3) float32 array."""
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+
+def quantize(values, accuracy):
+    """Round values to accuracy digits after the decimal point, as integers."""
+    return np.round(values.astype(np.float64) * (10 ** accuracy)).astype(np.int64)
+
+
+def material_names(mesh):
+    """Return the material names of a mesh's slots, as bytes ready for hashing."""
+    return "\0".join(mat.name if mat else "None" for mat in mesh.materials).encode()
+
+
+def hash_buffers(*buffers):
+    """Hash a sequence of arrays or bytes into a short hex digest."""
+    digest = hashlib.blake2b(digest_size=16)
+    for buffer in buffers:
+        if isinstance(buffer, np.ndarray):
+            # Shape is hashed too, so arrays with the same bytes but different layouts differ
+            digest.update(str(buffer.shape).encode())
+            buffer = np.ascontiguousarray(buffer).tobytes()
+        digest.update(buffer)
+        digest.update(b"|")
+    return digest.hexdigest()
+
+
+def read_uvs(mesh):
+    """Read the UV coordinates of every UV map of a mesh into one float32 array."""
+    uvs = np.empty(len(mesh.uv_layers) * len(mesh.loops) * 2, dtype=np.float32)
+    for i, layer in enumerate(mesh.uv_layers):
+        layer.data.foreach_get("uv", uvs[i * len(mesh.loops) * 2:(i + 1) * len(mesh.loops) * 2])
+    return uvs
+
+
+def read_face_materials(mesh):
+    """Read the material slot index of every face into an int32 array."""
+    indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", indices)
+    return indices
+
+
+def read_full(mesh, uvs=False, face_materials=False):
+    """Read everything a full fingerprint hashes. UVs and face materials are optional components."""
+    return (
+        read_coordinates(mesh),
+        material_names(mesh),
+        read_uvs(mesh) if uvs else None,
+        read_face_materials(mesh) if face_materials else None
+    )
+
+
+def hash_full(co, materials, uvs, face_materials, accuracy):
+    """Quantize and hash what read_full returned, the part of a fingerprint that needs no bpy access."""
+    buffers = [quantize(co, accuracy), materials]
+    if uvs is not None:
+        buffers.append(quantize(uvs, accuracy))
+    if face_materials is not None:
+        buffers.append(face_materials)
+    return hash_buffers(*buffers)
+
+
+def full_fingerprint(mesh, accuracy, uvs=False, face_materials=False):
+    """Fingerprint a mesh by its quantized vertex positions and materials, optionally UVs and face materials."""
+    return hash_full(*read_full(mesh, uvs, face_materials), accuracy)
+
+
+def full_fingerprints(meshes, accuracy, uvs=False, face_materials=False, workers=None):
+    """Fingerprint many meshes, hashing on worker threads while this thread reads the next mesh.
+
+    Only this thread touches bpy. NumPy and hashlib release the GIL on large buffers, so the
+    quantize and hash work runs on all cores. Results match full_fingerprint exactly.
+    """
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(hash_full, *read_full(mesh, uvs, face_materials), accuracy) for mesh in meshes]
+        return {mesh: future.result() for mesh, future in zip(meshes, futures)}
+
+
+def bounds_signature(obj, accuracy):
+    """Signature of an object's local bounding box size, read from the 8 cached corners."""
+    corners = np.array(obj.bound_box)
+    return tuple(quantize(corners.max(axis=0) - corners.min(axis=0), accuracy).tolist())
+
+
+def sampled_fingerprint(mesh, accuracy, samples=64):
+    """Hash a few evenly spread vertices, cheap to read even on heavy meshes."""
+    if len(mesh.vertices) == 0:
+        return ""
+    indices = np.unique(np.linspace(0, len(mesh.vertices) - 1, samples).astype(np.int64))
+    vertices = mesh.vertices
+    co = np.array([vertices[int(i)].co for i in indices], dtype=np.float32)
+    return hash_buffers(quantize(co, accuracy))
+
+
+# ID property holding fingerprints on each mesh, saved with the .blend
+CACHE_PROPERTY = "setupauto_fingerprint"
+
+
+def sampled_uvs(mesh, samples=16):
+    """Read a few evenly spread UVs of the active UV map, so UV edits change the stamp."""
+    layer = mesh.uv_layers.active
+    if layer is None or len(mesh.loops) == 0:
+        return np.zeros(0, dtype=np.float32)
+    indices = np.unique(np.linspace(0, len(mesh.loops) - 1, samples).astype(np.int64))
+    return np.array([layer.data[int(i)].uv for i in indices], dtype=np.float32)
+
+
+def validity_stamp(mesh):
+    """Cheap stamp that changes when a mesh is edited: counts, materials, sampled vertices and UVs."""
+    counts = np.array([len(mesh.vertices), len(mesh.edges), len(mesh.polygons), len(mesh.uv_layers)])
+    return hash_buffers(counts, material_names(mesh), sampled_fingerprint(mesh, 6, 16).encode(), sampled_uvs(mesh))
+
+
+def stored_fingerprint(mesh, name):
+    """Return the fingerprint stored on the mesh under name, or None if missing or stale."""
+    cache = mesh.get(CACHE_PROPERTY)
+    if mesh.library or cache is None or cache.get("stamp") != validity_stamp(mesh):
+        return None
+    return cache["hashes"].get(name)
+
+
+def cached_fingerprint(mesh, name, compute):
+    """Return the fingerprint stored on the mesh under name, computing and storing it if stale.
+
+    All stored fingerprints are dropped together when the mesh's validity stamp changes.
+    Linked library meshes cannot store properties and are always computed.
+    """
+    if mesh.library:
+        return compute(mesh)
+
+    stamp = validity_stamp(mesh)
+    cache = mesh.get(CACHE_PROPERTY)
+    if cache is None or cache.get("stamp") != stamp:
+        mesh[CACHE_PROPERTY] = {"stamp": stamp, "hashes": {}}
+        cache = mesh[CACHE_PROPERTY]
+
+    hashes = cache["hashes"]
+    if name not in hashes:
+        hashes[name] = compute(mesh)
+    return hashes[name]
+
+
+def read_edges(mesh):
+    """Read edge vertex pairs of a mesh into an (n, 2) int32 array."""
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    return edges.reshape(-1, 2)
+
+
+def surface_area(mesh):
+    """Sum the polygon areas of a mesh."""
+    areas = np.empty(len(mesh.polygons), dtype=np.float32)
+    mesh.polygons.foreach_get("area", areas)
+    return float(areas.sum(dtype=np.float64))
+
+
+def count_signature(mesh):
+    """Cheapest signature: element counts and materials, no buffers read."""
+    return (len(mesh.vertices), len(mesh.edges), len(mesh.polygons), material_names(mesh))
+
+
+def shape_signature(mesh, co, accuracy):
+    """Signature that does not change when the mesh is moved or rotated.
+
+    Combines the surface area with a hash of all edge lengths, sorted so that vertex and
+    edge order do not matter either.
+    """
+    edges = read_edges(mesh)
+    lengths = np.linalg.norm(co[edges[:, 0]] - co[edges[:, 1]], axis=1)
+    area = round(surface_area(mesh), accuracy)
+    return (area, hash_buffers(np.sort(quantize(lengths, accuracy))))
+
+
+def canonical_pose(co):
+    """Find the centre and principal axes of a point cloud.
+
+    Returns the centre and a proper rotation whose columns are the principal axes, biggest
+    spread first. Axis signs are chosen so the points are skewed towards the positive side,
+    which makes the pose the same for any rigidly moved copy of the points.
+    """
+    points = co.astype(np.float64)
+    centre = points.mean(axis=0)
+    centred = points - centre
+
+    _, axes = np.linalg.eigh(centred.T @ centred)
+    axes = axes[:, ::-1]
+
+    skew = ((centred @ axes) ** 3).sum(axis=0)
+    axes *= np.where(skew < 0.0, -1.0, 1.0)
+    if np.linalg.det(axes) < 0.0:
+        axes[:, 2] *= -1.0
+
+    return centre, axes
+
+
+def canonical_signature(co, pose, accuracy):
+    """Hash vertex positions expressed in their canonical pose, ignoring vertex order."""
+    centre, axes = pose
+    canonical = quantize((co.astype(np.float64) - centre) @ axes, accuracy)
+    order = np.lexsort(canonical.T[::-1])
+    return hash_buffers(canonical[order])
+
+
+def rigid_transform(source_pose, target_pose):
+    """Return the 4x4 matrix moving points from the source pose onto the target pose."""
+    source_centre, source_axes = source_pose
+    target_centre, target_axes = target_pose
+
+    rotation = target_axes @ source_axes.T
+    matrix = np.identity(4)
+    matrix[:3, :3] = rotation
+    matrix[:3, 3] = target_centre - rotation @ source_centre
+    return matrix
+
+
+def refine(buckets, key_function):
+    """Split every bucket by a key, dropping members left alone since they have no match."""
+    refined = []
+    for bucket in buckets:
+        split = {}
+        for member in bucket:
+            split.setdefault(key_function(member), []).append(member)
+        refined.extend(group for group in split.values() if len(group) > 1)
+    return refined
+
+
+def run_stages(buckets, stages):
+    """Refine buckets through a list of (name, key function) stages, cheapest first.
+
+    A stage may carry a third item, a function called once with all members entering the
+    stage, e.g. to compute their keys in bulk.
+    Returns the remaining buckets and, per stage, its name, how many members it removed
+    and how long it took.
+    """
+    stats = []
+    for name, key_function, *prepare in stages:
+        start = time.perf_counter()
+        before = sum(len(bucket) for bucket in buckets)
+        if prepare:
+            prepare[0]([member for bucket in buckets for member in bucket])
+        buckets = refine(buckets, key_function)
+        removed = before - sum(len(bucket) for bucket in buckets)
+        stats.append((name, removed, time.perf_counter() - start))
+    return buckets, stats
+
+
+def build_kdtree(co):
+    """Build a balanced KD tree over vertex positions, indexed by vertex."""
+    tree = KDTree(len(co))
+    for i, position in enumerate(co.tolist()):
+        tree.insert(position, i)
+    tree.balance()
+    return tree
+
+
+def within_tolerance(co_a, co_b, tolerance, any_order=False, tree_a=None, tree_b=None):
+    """Check that two vertex arrays match within tolerance on every coordinate.
+
+    With any_order, every vertex of each mesh only has to be near some vertex of the other,
+    found with KD trees, so meshes with the same shape but shuffled vertex order still match.
+    Checking both ways stops a mesh whose vertices collapse onto part of the other from
+    matching. Trees built once per mesh can be passed in, otherwise they are built here.
+    """
+    if co_a.shape != co_b.shape:
+        return False
+
+    if not any_order:
+        return float(np.abs(co_a - co_b).max(initial=0.0)) <= tolerance
+
+    # A distance within tolerance on every axis is at most sqrt(3) times tolerance
+    radius = tolerance * 3 ** 0.5
+    if tree_a is None:
+        tree_a = build_kdtree(co_a)
+    if not all(tree_a.find(co)[2] <= radius for co in co_b.tolist()):
+        return False
+    if tree_b is None:
+        tree_b = build_kdtree(co_b)
+    return all(tree_b.find(co)[2] <= radius for co in co_a.tolist())
+
+
+def match_quality(groups, truth):
+    """Compare groups of members against ground truth labels, as pair precision and recall.
+
+    truth maps a member to its true duplicate label. Members without a label are ignored.
+    """
+    def pairs(count):
+        return count * (count - 1) // 2
+
+    predicted = 0
+    correct = 0
+    for group in groups:
+        labels = [truth[member] for member in group if member in truth]
+        predicted += pairs(len(labels))
+        correct += sum(pairs(labels.count(label)) for label in set(labels))
+
+    counts = {}
+    for label in truth.values():
+        counts[label] = counts.get(label, 0) + 1
+    actual = sum(pairs(count) for count in counts.values())
+
+    precision = correct / predicted if predicted else 1.0
+    recall = correct / actual if actual else 1.0
+    return precision, recall
@@ -0,0 +1,192 @@
+import bpy
+import numpy as np
+
+
+
+# Data level join shared by proximity join and quick sort.
+# Merges mesh buffers with foreach_get/foreach_set instead of calling bpy.ops.object.join per group,
+# so all groups are joined in one pass and one undo step.
+# Shape keys, custom normals and edge flags are not carried over.
+
+def read_mesh(mesh):
+    """Read the buffers of a mesh needed to rebuild it into NumPy arrays."""
+    data = {}
+
+    data['co'] = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", data['co'])
+    data['co'] = data['co'].reshape(-1, 3)
+
+    data['edges'] = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", data['edges'])
+
+    data['loop_verts'] = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", data['loop_verts'])
+
+    data['loop_start'] = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", data['loop_start'])
+
+    data['material_index'] = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", data['material_index'])
+
+    data['smooth'] = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", data['smooth'])
+
+    data['uvs'] = {}
+    for layer in mesh.uv_layers:
+        uv = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        layer.data.foreach_get("uv", uv)
+        data['uvs'][layer.name] = uv
+
+    return data
+
+
+def flip_loops(loop_verts, loop_start):
+    """Reverse the winding of every polygon, used for mirrored objects."""
+    totals = np.diff(np.append(loop_start, len(loop_verts)))
+    starts = np.repeat(loop_start, totals)
+    ends = starts + np.repeat(totals, totals) - 1
+    return loop_verts[starts + ends - np.arange(len(loop_verts))]
+
+
+def join_group(target, objects):
+    """Merge the meshes of objects into a new mesh on target, in target's local space."""
+    target_inverse = np.array(target.matrix_world.inverted(), dtype=np.float64)
+    materials = []
+    parts = []
+
+    for obj in objects:
+        data = read_mesh(obj.data)
+
+        # Move vertices from the object's space into the target's space
+        matrix = target_inverse @ np.array(obj.matrix_world, dtype=np.float64)
+        data['co'] = (data['co'] @ matrix[:3, :3].T + matrix[:3, 3]).astype(np.float32)
+        if np.linalg.det(matrix[:3, :3]) < 0:
+            data['loop_verts'] = flip_loops(data['loop_verts'], data['loop_start'])
+            for name, uv in data['uvs'].items():
+                data['uvs'][name] = flip_loops(uv.reshape(-1, 2), data['loop_start']).ravel()
+
+        # Map material slots of each object into one shared slot list
+        slot_map = []
+        for slot in obj.material_slots:
+            if slot.material not in materials:
+                materials.append(slot.material)
+            slot_map.append(materials.index(slot.material))
+        if slot_map:
+            data['material_index'] = np.array(slot_map, dtype=np.int32)[np.clip(data['material_index'], 0, len(slot_map) - 1)]
+
+        parts.append(data)
+
+    vert_offsets = np.cumsum([0] + [len(p['co']) for p in parts])
+    loop_offsets = np.cumsum([0] + [len(p['loop_verts']) for p in parts])
+
+    mesh = bpy.data.meshes.new(target.data.name)
+    mesh.vertices.add(int(vert_offsets[-1]))
+    mesh.edges.add(sum(len(p['edges']) // 2 for p in parts))
+    mesh.loops.add(int(loop_offsets[-1]))
+    mesh.polygons.add(sum(len(p['loop_start']) for p in parts))
+
+    mesh.vertices.foreach_set("co", np.concatenate([p['co'] for p in parts]).ravel())
+    mesh.edges.foreach_set("vertices", np.concatenate([p['edges'] + vert_offsets[i] for i, p in enumerate(parts)]).astype(np.int32))
+    mesh.loops.foreach_set("vertex_index", np.concatenate([p['loop_verts'] + vert_offsets[i] for i, p in enumerate(parts)]).astype(np.int32))
+    mesh.polygons.foreach_set("loop_start", np.concatenate([p['loop_start'] + loop_offsets[i] for i, p in enumerate(parts)]).astype(np.int32))
+    mesh.polygons.foreach_set("material_index", np.concatenate([p['material_index'] for p in parts]))
+    mesh.polygons.foreach_set("use_smooth", np.concatenate([p['smooth'] for p in parts]))
+
+    uv_names = []
+    for p in parts:
+        uv_names.extend(name for name in p['uvs'] if name not in uv_names)
+    for name in uv_names:
+        layer = mesh.uv_layers.new(name=name)
+        layer.data.foreach_set("uv", np.concatenate([p['uvs'].get(name, np.zeros(len(p['loop_verts']) * 2, dtype=np.float32)) for p in parts]))
+
+    for material in materials:
+        mesh.materials.append(material)
+
+    mesh.update(calc_edges=True)
+    target.data = mesh
+    return target
+
+
+def used_materials(obj):
+    """Return the distinct materials actually assigned to faces of a mesh object."""
+    mesh = obj.data
+    if not obj.material_slots:
+        return set()
+
+    indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", indices)
+    slots = obj.material_slots
+    return {slots[int(min(i, len(slots) - 1))].material for i in np.unique(indices)}
+
+
+def material_stats(objects):
+    """Count material slots and estimate draw calls, one per distinct material used per object."""
+    slots = sum(len(obj.material_slots) for obj in objects)
+    draw_calls = sum(max(len(used_materials(obj)), 1) for obj in objects)
+    return slots, draw_calls
+
+
+def mesh_memory(mesh):
+    """Roughly estimate the bytes a mesh's geometry takes: positions, indices and UVs."""
+    return (len(mesh.vertices) * 12
+            + len(mesh.edges) * 8
+            + len(mesh.loops) * (8 + 8 * len(mesh.uv_layers))
+            + len(mesh.polygons) * 8)
+
+
+def merge_material_slots(obj):
+    """Collapse slots holding the same material and drop slots no face uses.
+
+    Slots are compared by the material they show, linked to the mesh or the object. The
+    merged materials are linked to the mesh.
+    """
+    mesh = obj.data
+    slot_materials = [slot.material for slot in obj.material_slots]
+    if len(slot_materials) < 2:
+        return
+
+    indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", indices)
+    indices = np.clip(indices, 0, len(slot_materials) - 1)
+
+    materials = []
+    remap = np.zeros(len(slot_materials), dtype=np.int32)
+    for slot_index in np.unique(indices):
+        material = slot_materials[int(slot_index)]
+        if material not in materials:
+            materials.append(material)
+        remap[slot_index] = materials.index(material)
+
+    if len(materials) == len(slot_materials):
+        return
+
+    mesh.materials.clear()
+    for material in materials:
+        mesh.materials.append(material)
+    for slot in obj.material_slots:
+        slot.link = 'DATA'
+    mesh.polygons.foreach_set("material_index", remap[indices])
+
+
+def join_clusters(clusters):
+    """Join each cluster of mesh objects into its first object.
+
+    All clusters are merged before anything is removed, then the joined away objects and
+    the meshes they leave unused are removed in bulk. Returns the joined objects.
+    """
+    joined = []
+    removed_objects = []
+    old_meshes = set()
+
+    for cluster in clusters:
+        if len(cluster) < 2:
+            continue
+
+        old_meshes.update(obj.data for obj in cluster)
+        joined.append(join_group(cluster[0], cluster))
+        removed_objects.extend(cluster[1:])
+
+    bpy.data.batch_remove(removed_objects)
+    bpy.data.batch_remove([mesh for mesh in old_meshes if mesh.users == 0])
+
+    return joined
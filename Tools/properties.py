@@ -36,6 +36,76 @@ class SETUPAUTO_PG_tools_props (bpy.types.PropertyGroup):
         default = True
     )
 
+    proximity_mode : bpy.props.EnumProperty(
+        name = "Distance Mode",
+        description = "How the distance between two objects is measured.",
+        items = [
+        ('ORIGIN', "Origin", "Distance between object origins"),
+        ('BOUNDS', "Bounds", "Gap between world space bounding boxes"),
+        ('MESH', "Mesh", "Gap between actual meshes, slower. Axis toggles only apply to the bounding box test"),
+        ],
+        default = 'ORIGIN'
+    )
+
+    max_extent : bpy.props.FloatProperty(
+        name = "Max Extent",
+        description = "Largest bounding box size a joined object may have. Bigger clusters are split. 0 means no limit.",
+        default = 0.0,
+        min = 0.0
+    )
+
+    max_vertices : bpy.props.IntProperty(
+        name = "Max Vertices",
+        description = "Largest vertex count a joined object may have. Bigger clusters are split. 0 means no limit.",
+        default = 0,
+        min = 0
+    )
+
+    material_mode : bpy.props.EnumProperty(
+        name = "Materials",
+        description = "How materials affect which objects are joined.",
+        items = [
+        ('IGNORE', "Ignore Materials", "Join objects regardless of their materials"),
+        ('MATCH', "Match Materials", "Only join objects that use the same set of materials"),
+        ],
+        default = 'IGNORE'
+    )
+
+    merge_material_slots : bpy.props.BoolProperty(
+        name = "Merge Material Slots",
+        description = "After joining, merge slots holding the same material and remove unused slots.",
+        default = True
+    )
+
+    instance_mode : bpy.props.EnumProperty(
+        name = "Instances",
+        description = "How objects sharing mesh data with other objects are handled.",
+        items = [
+        ('SKIP', "Skip Instances", "Leave objects with shared mesh data untouched, keeping the instancing"),
+        ('JOIN', "Join Instances", "Join objects with shared mesh data too, copying their data into the joined object"),
+        ],
+        default = 'SKIP'
+    )
+
+    join_method : bpy.props.EnumProperty(
+        name = "Join Method",
+        description = "How clusters are joined.",
+        items = [
+        ('OPERATOR', "Operator", "Run Blender's join operator once per cluster, keeping all mesh data"),
+        ('DATA', "Data (Lossy)", "Merge mesh data of all clusters in one pass, much faster on large selections. Drops vertex groups, custom normals, color and other attributes, seams, sharp edges and creases"),
+        ],
+        default = 'OPERATOR'
+    )
+
+#===================================
+    # --- Duplicates To Instances Properties ---
+#===================================
+    scan_collection : bpy.props.PointerProperty(
+        name = "Scan Collection",
+        description = "Collection whose mesh objects are scanned for duplicates, selected or not.",
+        type = bpy.types.Collection
+    )
+
 #===================================
     # --- Smart Apply Properties ---
 #===================================
@@ -1,6 +1,21 @@
 import bpy
+import time
+import colorsys
+import hashlib
+from collections import Counter
+import numpy as np
 from mathutils import Vector
+from mathutils.bvhtree import BVHTree
 
+from . import clustering, meshjoin
+
+
+
+# Last clustering result, reused by the real join after a dry run with the same inputs
+cluster_cache = {}
+
+# Origin grid kept between runs, so re-running after small edits only re-checks moved objects
+spatial_index = clustering.SpatialIndex()
 
 
 class SETUPAUTO_OT_proxjoin(bpy.types.Operator):
@@ -10,48 +25,83 @@ class SETUPAUTO_OT_proxjoin(bpy.types.Operator):
     bl_description = "Operator loops through objects in the scene, joining objects together if are closer than specified proximity."
     bl_options = {'REGISTER', 'UNDO'}
 
-    def execute(self, context):
-        tools_props = context.scene.tools_props
-        
-        if not context.selected_objects:
-            self.report({'INFO'}, "No objects were selected. Please select objects.")
-            return {'CANCELLED'}
+    dry_run : bpy.props.BoolProperty(
+        name = "Dry Run",
+        description = "Only compute clusters, tagging objects with a cluster id and color instead of joining them.",
+        default = False,
+        options = {'SKIP_SAVE'}
+    )
+
+    def world_matrices(self, objects):
+        """Read world matrices of objects into an (n, 16) float32 array in one pass."""
+        all_objects = bpy.data.objects
+        matrices = np.empty((len(all_objects), 16), dtype=np.float32)
+        all_objects.foreach_get("matrix_world", matrices.ravel())
+
+        lookup = {obj: i for i, obj in enumerate(all_objects)}
+        rows = np.fromiter((lookup[obj] for obj in objects), dtype=np.int64, count=len(objects))
+        return matrices[rows]
 
-        selected = [obj for obj in context.selected_objects if obj.type == 'MESH']
-        remaining = set(selected)
-        clusters = []
-        
-        axis_mask = Vector((
-            1.0 if tools_props.proximity_x else 0.0,
-            1.0 if tools_props.proximity_y else 0.0, 
-            1.0 if tools_props.proximity_z else 0.0
-        ))
 
-        while remaining:
-            obj = remaining.pop()
-            cluster = [obj]
-            to_check = [obj]
+    def world_bounds(self, objects, axis_mask):
+        """Get world space bounding box corners of objects, flattened on masked axes."""
+        mins = []
+        maxs = []
+        for obj in objects:
+            corners = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
+            mins.append(tuple(min(c[axis] for c in corners) * axis_mask[axis] for axis in range(3)))
+            maxs.append(tuple(max(c[axis] for c in corners) * axis_mask[axis] for axis in range(3)))
+        return mins, maxs
 
-            while to_check:
-                current = to_check.pop()
-                # Apply axis mask to current object's location
-                current_loc_masked = Vector(current.location) * axis_mask
 
-                close_objs = set()
-                for other in remaining:
-                    # Apply axis mask to other object's location
-                    other_loc_masked = Vector(other.location) * axis_mask
-                    # Calculate distance only on selected axes
-                    if (current_loc_masked - other_loc_masked).length <= tools_props.proximity:
-                        close_objs.add(other)
+    def mesh_narrow_phase(self, objects, proximity):
+        """Build a pair test measuring the gap between the actual meshes of two objects."""
+        trees = {}
+        world_verts = {}
 
-                cluster.extend(close_objs)
-                to_check.extend(close_objs)
-                remaining -= close_objs
+        def get_tree(i):
+            if i not in trees:
+                mesh = objects[i].data
+                co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+                mesh.vertices.foreach_get("co", co)
+                loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+                mesh.loops.foreach_get("vertex_index", loop_verts)
+                loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+                mesh.polygons.foreach_get("loop_start", loop_start)
 
-            clusters.append(cluster)
+                matrix = np.array(objects[i].matrix_world, dtype=np.float64)
+                world_verts[i] = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
 
-        # Join objects in cluster
+                polygons = [polygon.tolist() for polygon in np.split(loop_verts, loop_start[1:])] if len(loop_start) else []
+                trees[i] = BVHTree.FromPolygons(world_verts[i].tolist(), polygons) if polygons else None
+            return trees[i]
+
+        def near_vertices(verts, other):
+            """Vertices that can be within proximity of the other mesh, inside its grown bounds."""
+            low = world_verts[other].min(axis=0) - proximity
+            high = world_verts[other].max(axis=0) + proximity
+            return verts[np.all((verts >= low) & (verts <= high), axis=1)].tolist()
+
+        def test(a, b):
+            tree_a = get_tree(a)
+            tree_b = get_tree(b)
+            if tree_a is None or tree_b is None:
+                return True  # No faces to measure, the bounding box gap decides
+
+            if tree_a.overlap(tree_b):
+                return True
+
+            # Measure from the vertices of each mesh to the surface of the other, only for
+            # vertices inside the other's grown bounds. One direction alone misses a large
+            # face passing close to the other mesh's vertices
+            return (any(tree_b.find_nearest(co, proximity)[0] is not None for co in near_vertices(world_verts[a], b))
+                    or any(tree_a.find_nearest(co, proximity)[0] is not None for co in near_vertices(world_verts[b], a)))
+
+        return test
+
+
+    def join_with_operator(self, context, clusters):
+        """Join each cluster with bpy.ops.object.join, kept to compare against the data join."""
         for cluster in clusters:
             if len(cluster) < 2:
                 continue  # Nothing to join
@@ -61,9 +111,164 @@ class SETUPAUTO_OT_proxjoin(bpy.types.Operator):
             for obj in cluster:
                 obj.select_set(True)
 
-            bpy.context.view_layer.objects.active = cluster[0]
+            context.view_layer.objects.active = cluster[0]
             bpy.ops.object.join()
 
-        self.report({'INFO'}, f"Joined {len([c for c in clusters if len(c) > 1])} clusters.")
+
+    def cluster_objects(self, tools_props, selected, axis_mask, group_keys):
+        """Run the clustering engine on objects, returning clusters as lists of indices.
+
+        Objects with different group keys never end up in one cluster.
+        """
+        if tools_props.proximity_mode == 'ORIGIN':
+            # Matrices come out column major, the translation is the last column.
+            # Apply axis mask once, so distances are only measured on selected axes
+            matrices = self.world_matrices(selected)
+            points = matrices[:, 12:15] * np.array(axis_mask, dtype=np.float32)
+
+            # One update for all objects, groups are kept apart inside the index.
+            # Only objects whose transform or group changed since the last run are searched again
+            keys = [obj.as_pointer() for obj in selected]
+            stamps = [matrix.tobytes() for matrix in matrices]
+            self.reindexed += spatial_index.update(keys, points, stamps, (tools_props.proximity, axis_mask), group_keys)
+            self.indexed += len(keys)
+
+            by_key = {key: i for i, key in enumerate(keys)}
+            index_clusters = [[by_key[key] for key in cluster] for cluster in spatial_index.clusters(keys)]
+        else:
+            groups = {}
+            for i, group_key in enumerate(group_keys):
+                groups.setdefault(group_key, []).append(i)
+
+            index_clusters = []
+            for group in groups.values():
+                members = [selected[i] for i in group]
+                mins, maxs = self.world_bounds(members, axis_mask)
+                narrow_phase = None
+                if tools_props.proximity_mode == 'MESH':
+                    narrow_phase = self.mesh_narrow_phase(members, tools_props.proximity)
+                index_clusters.extend([group[i] for i in cluster]
+                                      for cluster in clustering.cluster_boxes(mins, maxs, tools_props.proximity, narrow_phase))
+
+        if tools_props.max_extent > 0.0 or tools_props.max_vertices > 0:
+            # Limits are measured on real world bounds, whatever axes the distance uses
+            mins, maxs = self.world_bounds(selected, (1.0, 1.0, 1.0))
+            vertex_counts = np.array([len(obj.data.vertices) for obj in selected])
+            index_clusters = clustering.split_clusters(
+                index_clusters, np.array(mins), np.array(maxs), vertex_counts,
+                tools_props.max_extent, tools_props.max_vertices
+            )
+
+        return index_clusters
+
+
+    def find_clusters(self, tools_props, selected):
+        """Cluster selected objects, reusing the last result if nothing it depends on changed."""
+        axis_mask = (
+            1.0 if tools_props.proximity_x else 0.0,
+            1.0 if tools_props.proximity_y else 0.0,
+            1.0 if tools_props.proximity_z else 0.0
+        )
+
+        cache_key = (
+            frozenset(obj.as_pointer() for obj in selected),
+            hashlib.blake2b(self.world_matrices(selected).tobytes()).digest(),
+            tools_props.proximity,
+            axis_mask,
+            tools_props.proximity_mode,
+            tools_props.max_extent,
+            tools_props.max_vertices,
+            tools_props.material_mode
+        )
+        if cluster_cache.get('key') == cache_key:
+            by_pointer = {obj.as_pointer(): obj for obj in selected}
+            return [[by_pointer[pointer] for pointer in cluster] for cluster in cluster_cache['clusters']]
+
+        if tools_props.material_mode == 'MATCH':
+            # Only objects with the same material set may end up in one cluster
+            group_keys = [frozenset(slot.material.as_pointer() if slot.material else 0 for slot in obj.material_slots)
+                          for obj in selected]
+        else:
+            group_keys = [None] * len(selected)
+
+        clusters = [[selected[i] for i in cluster] for cluster in self.cluster_objects(tools_props, selected, axis_mask, group_keys)]
+
+        cluster_cache['key'] = cache_key
+        cluster_cache['clusters'] = [[obj.as_pointer() for obj in cluster] for cluster in clusters]
+        return clusters
+
+
+    def preview_clusters(self, clusters, index_note=""):
+        """Tag objects with their cluster id and color, and report cluster sizes without joining."""
+        for cluster_id, cluster in enumerate(clusters):
+            hue = (cluster_id * 0.618034) % 1.0
+            color = colorsys.hsv_to_rgb(hue, 0.7, 0.9)
+            for obj in cluster:
+                obj["setupauto_cluster"] = cluster_id
+                obj.color = (*color, 1.0)
+
+        histogram = Counter(len(cluster) for cluster in clusters)
+        # Largest sizes first, the long tail of small clusters matters least
+        sizes = ", ".join(f"{count}x{size}" for size, count in sorted(histogram.items(), reverse=True)[:8])
+        if len(histogram) > 8:
+            sizes += ", ..."
+
+        joined_count = len([c for c in clusters if len(c) > 1])
+        self.report({'INFO'}, f"Preview: {len(clusters)} clusters, {joined_count} to join. Cluster sizes (count x size): {sizes}. "
+                    f"Set viewport color to Object to see them.{index_note}")
+
+
+    def execute(self, context):
+        tools_props = context.scene.tools_props
+        
+        if not context.selected_objects:
+            self.report({'INFO'}, "No objects were selected. Please select objects.")
+            return {'CANCELLED'}
+
+        selected = [obj for obj in context.selected_objects if obj.type == 'MESH']
+
+        # Joining copies shared mesh data into the joined object, losing the instancing memory savings
+        kept_memory = 0
+        if tools_props.instance_mode == 'SKIP':
+            instanced = [obj for obj in selected if obj.data.users > 1]
+            kept_memory = sum(meshjoin.mesh_memory(obj.data) for obj in instanced)
+            selected = [obj for obj in selected if obj.data.users <= 1]
+
+        self.reindexed = 0
+        self.indexed = 0
+        clusters = self.find_clusters(tools_props, selected)
+        index_note = f" Re-indexed {self.reindexed} of {self.indexed} objects, the rest had not moved." if self.indexed else ""
+
+        if self.dry_run:
+            self.preview_clusters(clusters, index_note)
+            return {'FINISHED'}
+
+        joined_count = len([c for c in clusters if len(c) > 1])
+        slots_before, draw_calls_before = meshjoin.material_stats(selected)
+
+        start = time.perf_counter()
+        if tools_props.join_method == 'DATA':
+            meshjoin.join_clusters(clusters)
+        else:
+            self.join_with_operator(context, clusters)
+        elapsed = time.perf_counter() - start
+
+        # The first object of every cluster is the one that remains after joining
+        results = [cluster[0] for cluster in clusters]
+        if tools_props.merge_material_slots:
+            # Objects left alone in their cluster were not joined and keep their slots
+            for cluster in clusters:
+                if len(cluster) > 1:
+                    meshjoin.merge_material_slots(cluster[0])
+        slots_after, draw_calls_after = meshjoin.material_stats(results)
+
+        # Joined objects are gone, so the cached clusters no longer describe the scene
+        # Joined away objects leave the spatial index on its next update, which drops missing keys
+        cluster_cache.clear()
+
+        self.report({'INFO'}, f"Joined {joined_count} clusters in {elapsed:.2f}s ({tools_props.join_method.lower()} join). "
+                    f"Material slots: {slots_before} -> {slots_after}, estimated draw calls: {draw_calls_before} -> {draw_calls_after}.{index_note}")
+        if tools_props.instance_mode == 'SKIP':
+            self.report({'INFO'}, f"Skipped {len(instanced)} instanced objects, keeping about {kept_memory / 1048576:.1f} MB of mesh data a naive join would copy.")
 
         return {'FINISHED'}
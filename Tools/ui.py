@@ -24,8 +24,18 @@ class SETUPAUTO_PT_tools_panel(bpy.types.Panel):
         rowAxis.prop(toolprops, "proximity_y", text="Y", toggle=True)
         rowAxis.prop(toolprops, "proximity_z", text="Z", toggle=True)
         
+        columnJoin.prop(toolprops, "proximity_mode", text="")
         columnJoin.prop(toolprops, "proximity")
-        columnJoin.operator('setupauto.ot_proxjoin', text = "Join By Proximity")
+        columnJoin.prop(toolprops, "max_extent")
+        columnJoin.prop(toolprops, "max_vertices")
+        columnJoin.prop(toolprops, "material_mode", text="")
+        columnJoin.prop(toolprops, "merge_material_slots")
+        columnJoin.prop(toolprops, "instance_mode", text="")
+        columnJoin.prop(toolprops, "join_method", text="")
+        if toolprops.join_method == 'DATA':
+            columnJoin.label(text = "Drops vertex groups, custom normals and attributes.", icon = 'INFO')
+        columnJoin.operator('setupauto.ot_proxjoin', text = "Preview Clusters").dry_run = True
+        columnJoin.operator('setupauto.ot_proxjoin', text = "Join By Proximity").dry_run = False
 
 
         # Smart Apply Transforms section
@@ -50,4 +60,7 @@ class SETUPAUTO_PT_tools_panel(bpy.types.Panel):
         columnInst.operator('setupauto.ot_smartselect', text = "Selecte All Linked")
         columnInst.operator('setupauto.ot_singleuser', text = "Make Single Users")
         columnInst.operator('setupauto.ot_dups2inst', text = "Duplicate to Instances")
+        rowScan = columnInst.row(align=True)
+        rowScan.prop(toolprops, "scan_collection", text = "", placeholder = "Scan Collection")
+        rowScan.operator('setupauto.ot_dups2inst_scan', text = "Scan")
         columnInst.operator('outliner.orphans_purge', text = "Purge Unused Data")
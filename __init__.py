@@ -18,6 +18,7 @@ import bpy
 from . import quicksort
 from . import bgimage
 from . import Tools
+from . import lodmaker
 
 # Import the addon updater (not part of auto-registration)
 from . import addon_updater_ops
@@ -110,6 +111,7 @@ def register():
     quicksort.register()
     bgimage.register()
     Tools.register()
+    lodmaker.register()
 
 
 def unregister():
@@ -119,6 +121,7 @@ def unregister():
     quicksort.unregister()
     bgimage.unregister()
     Tools.unregister()
+    lodmaker.unregister()
     
     # Unregister preferences class (not part of auto-load)
     bpy.utils.unregister_class(SetupAutoPreferences)
@@ -0,0 +1,23 @@
+import bpy
+
+# Lodmaker module registration
+from . import properties, operator, ui
+
+classes = [
+    properties.SETUPAUTO_PG_lodmaker_props,
+    operator.SETUPAUTO_OT_lodmaker,
+    ui.SETUPAUTO_PT_lodmaker_panel,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+    bpy.types.Scene.lodmaker_props = bpy.props.PointerProperty(type=properties.SETUPAUTO_PG_lodmaker_props)
+
+def unregister():
+    if hasattr(bpy.types.Scene, 'lodmaker_props'):
+        delattr(bpy.types.Scene, 'lodmaker_props')
+
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
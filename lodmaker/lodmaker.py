@@ -1,55 +1,237 @@
-from typing import Self
 import bpy
-from mathutils import Vector
+import bmesh
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from mathutils.bvhtree import BVHTree
 
 
-def duplicate_object(obj):
-    """Create a duplicate of the given object and apply convex hull."""
-    # Create a copy of the object
-    duplicate = obj.copy()
-    duplicate.data = obj.data.copy()
+def make_hull_mesh(mesh):
+    """Create a new mesh holding the convex hull of the given mesh.
 
-    bpy.context.collection.objects.link(duplicate)
+    The hull is built with bmesh on the data, no edit mode needed. Each hull face takes the
+    material of the nearest original face. Returns None for meshes without a hull, like
+    empty or single edge meshes.
+    """
+    if len(mesh.vertices) < 3:
+        return None
+
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+
+    bm = bmesh.new()
+    for vertex in co.tolist():
+        bm.verts.new(vertex)
+    try:
+        hull = bmesh.ops.convex_hull(bm, input=bm.verts)
+    except RuntimeError:
+        bm.free()
+        return None
+    bmesh.ops.delete(bm, geom=[v for v in hull['geom_interior'] + hull['geom_unused'] if isinstance(v, bmesh.types.BMVert)], context='VERTS')
+
+    if mesh.polygons:
+        tree = BVHTree.FromPolygons(co.tolist(), [tuple(polygon.vertices) for polygon in mesh.polygons])
+        material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("material_index", material_indices)
+        for face in bm.faces:
+            index = tree.find_nearest(face.calc_center_median())[2]
+            if index is not None:
+                face.material_index = int(material_indices[index])
+
+    hull_mesh = bpy.data.meshes.new(mesh.name + "_LOD")
+    bm.to_mesh(hull_mesh)
+    bm.free()
+
+    for material in mesh.materials:
+        hull_mesh.materials.append(material)
+
+    return hull_mesh
 
-    bpy.ops.object.select_all(action='DESELECT')
-    bpy.context.view_layer.objects.active = duplicate
-    duplicate.select_set(True)
-    
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.select_all(action='SELECT')
-    bpy.ops.mesh.convex_hull()
-    bpy.ops.object.mode_set(mode='OBJECT')
-    bpy.ops.object.select_all(action='DESELECT')
-    bpy.context.view_layer.objects.active = duplicate
-    
-    return duplicate
 
+# ID property on a source material pointing at its flattened LOD copy, saved with the .blend
+LOD_MATERIAL_PROPERTY = "setupauto_lod_material"
+
+# Flattened copies of linked library materials, which cannot store the property
+lod_material_cache = {}
+
+
+def get_lod_material(material, stats):
+    """Return the flattened LOD copy of a material, creating it only the first time.
+
+    Every LOD using the same source material shares one copy. stats counts created and
+    reused copies.
+    """
+    lod_material = lod_material_cache.get(material) if material.library else material.get(LOD_MATERIAL_PROPERTY)
+    if lod_material is not None:
+        stats['reused'] += 1
+        return lod_material
+
+    lod_material = material.copy()
+    lod_material.name = material.name + "_LOD"
+    if LOD_MATERIAL_PROPERTY in lod_material:
+        del lod_material[LOD_MATERIAL_PROPERTY]
+    replace_textures_with_rgb(lod_material)
+
+    if material.library:
+        lod_material_cache[material] = lod_material
+    else:
+        material[LOD_MATERIAL_PROPERTY] = lod_material
+    stats['created'] += 1
+    return lod_material
 
-def make_material_users(obj):
-    """Make new users for all materials of the object."""
-    if not obj.data.materials:
-        Self.report({'INFO'}, "Object has no materials")
+
+def make_material_users(mesh, stats):
+    """Replace all materials of the mesh with their shared flattened LOD copies."""
+    if not mesh.materials:
+        print(f"Mesh {mesh.name} has no materials")
         return
-    
-    # Create new materials and replace them directly in their slots
-    for i, material in enumerate(obj.data.materials):
+
+    for i, material in enumerate(mesh.materials):
         if material:  # Check if slot is not empty
-            new_material = material.copy()
-            new_material.name = material.name + "_LOD"
-            # Replace the material directly in its slot
-            obj.material_slots[i].material = new_material
+            mesh.materials[i] = get_lod_material(material, stats)
+
+
+def make_lod_mesh(mesh, stats):
+    """Create the LOD mesh of a mesh: its convex hull, with flat colour copies of its materials."""
+    lod_mesh = make_hull_mesh(mesh)
+    if lod_mesh is not None:
+        make_material_users(lod_mesh, stats)
+    return lod_mesh
+
+
+def parse_values(text):
+    """Parse a comma separated list of numbers, raising ValueError on anything else."""
+    return [float(value) for value in text.replace(";", ",").split(",") if value.strip()]
+
+
+def needs_base_mesh(obj):
+    """Check whether an object shows more than its mesh: modifiers or object linked materials."""
+    return bool(obj.modifiers) or any(slot.link == 'OBJECT' for slot in obj.material_slots)
+
+
+def make_base_meshes(context, objects):
+    """Bake what each object adds to its mesh into a new mesh, to build its LODs from.
+
+    Modifiers are applied by reading the depsgraph evaluated mesh, all objects in one
+    evaluation, and object linked materials are put in the mesh's slots. Returns the new
+    meshes by object.
+    """
+    if not objects:
+        return {}
+
+    depsgraph = context.evaluated_depsgraph_get()
+    base_meshes = {}
+    for obj in objects:
+        mesh = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph), depsgraph=depsgraph)
+        mesh.name = obj.name + "_LODbase"
+        for i, slot in enumerate(obj.material_slots):
+            if slot.link == 'OBJECT' and i < len(mesh.materials):
+                mesh.materials[i] = slot.material
+        base_meshes[obj] = mesh
+
+    return base_meshes
 
 
-def get_texture_average_rgb(texture):
-    """Calculate the average RGB value of a texture."""
-    if not texture or not hasattr(texture, 'image') or not texture.image:
+def make_decimated_meshes(context, jobs):
+    """Create a decimated copy of a mesh for every (mesh, ratio) job.
+
+    Each Decimate modifier sits on a temporary object and is applied by reading the depsgraph
+    evaluated mesh, so no operators or mode switches are needed. All temporary objects are
+    linked first, so the scene is evaluated once for the whole batch.
+    Returns the new meshes by job.
+    """
+    temp_objects = {}
+    for mesh, ratio in jobs:
+        temp_object = bpy.data.objects.new(mesh.name + "_decimate", mesh)
+        context.scene.collection.objects.link(temp_object)
+        modifier = temp_object.modifiers.new("Decimate", 'DECIMATE')
+        modifier.ratio = ratio
+        temp_objects[(mesh, ratio)] = temp_object
+
+    decimated_meshes = {}
+    try:
+        depsgraph = context.evaluated_depsgraph_get()
+        for (mesh, ratio), temp_object in temp_objects.items():
+            decimated_mesh = bpy.data.meshes.new_from_object(temp_object.evaluated_get(depsgraph), depsgraph=depsgraph)
+            decimated_mesh.name = f"{mesh.name}_LOD{ratio:g}"
+            decimated_meshes[(mesh, ratio)] = decimated_mesh
+    finally:
+        bpy.data.batch_remove(list(temp_objects.values()))
+
+    return decimated_meshes
+
+
+def add_distance_switcher(obj, camera, near, far):
+    """Drive the visibility of obj so it only shows while the camera is between near and far.
+
+    The expression is a simple one Blender evaluates without Python, so it works with
+    auto run scripts disabled.
+    """
+    for path in ("hide_viewport", "hide_render"):
+        obj.driver_remove(path)
+        driver = obj.driver_add(path).driver
+        driver.type = 'SCRIPTED'
+
+        variable = driver.variables.new()
+        variable.name = "distance"
+        variable.type = 'LOC_DIFF'
+        variable.targets[0].id = obj
+        variable.targets[1].id = camera
+
+        if far is None:
+            driver.expression = f"distance < {near}"
+        else:
+            driver.expression = f"not ({near} <= distance < {far})"
+
+
+def srgb_to_linear(values):
+    """Decode sRGB encoded values to scene linear, the space material colours are in."""
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def get_texture_average_rgb(image, max_size=0):
+    """Calculate the average scene linear RGB value of an image.
+
+    Pixels are read in one foreach_get call into a float32 buffer and averaged per channel.
+    Byte images in sRGB are decoded to linear first, so the average matches material colours.
+    With max_size, only every n-th pixel on each axis is averaged, like reading a smaller mip.
+    """
+    if not image or not image.pixels:
         return (0.5, 0.5, 0.5)  # Default gray color
-    
-    image = texture.image
-    if not image.pixels:
+
+    width, height = image.size
+    channels = image.channels
+    if width * height == 0:
         return (0.5, 0.5, 0.5)
-    
-    # Get image pixels as a list
+
+    pixels = np.empty(width * height * channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    pixels = pixels.reshape(height, width, channels)
+
+    if max_size and max(width, height) > max_size:
+        step = -(-max(width, height) // max_size)
+        pixels = pixels[::step, ::step]
+
+    pixels = pixels.reshape(-1, channels)
+    if not image.is_float and image.colorspace_settings.name == 'sRGB':
+        pixels = srgb_to_linear(pixels[:, :3])
+
+    average = pixels.mean(axis=0, dtype=np.float64)
+
+    if channels >= 3:
+        # RGBA format - take first 3 channels
+        return tuple(float(value) for value in average[:3])
+
+    # Grayscale image
+    gray_value = float(average[0])
+    return (gray_value, gray_value, gray_value)
+
+
+def get_texture_average_rgb_loop(image):
+    """Calculate the average RGB value of an image one pixel at a time, kept for benchmarking."""
     pixels = list(image.pixels)
     
     # Get image dimensions
@@ -76,11 +258,112 @@ def get_texture_average_rgb(texture):
             total_g += gray_value
             total_b += gray_value
     
-    avg_r = total_r / pixel_count
-    avg_g = total_g / pixel_count
-    avg_b = total_b / pixel_count
-    
-    return (avg_r, avg_g, avg_b)
+    return (total_r / pixel_count, total_g / pixel_count, total_b / pixel_count)
+
+
+def benchmark_texture_average(sizes=(1024, 4096, 8192), include_loop=True):
+    """Time the per pixel loop against the NumPy path on generated square images and print the results."""
+    results = []
+    for size in sizes:
+        image = bpy.data.images.new(f"lod_benchmark_{size}", size, size, alpha=True)
+        image.generated_type = 'COLOR_GRID'
+
+        timings = {}
+        start = time.perf_counter()
+        get_texture_average_rgb(image)
+        timings['numpy'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_texture_average_rgb(image, max_size=size // 8)
+        timings['numpy mip'] = time.perf_counter() - start
+
+        if include_loop:
+            start = time.perf_counter()
+            get_texture_average_rgb_loop(image)
+            timings['loop'] = time.perf_counter() - start
+
+        bpy.data.images.remove(image)
+        results.append((size, timings))
+        print(f"{size}x{size}: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
+
+    return results
+
+
+# Averages by image key, shared by every LOD built in this Blender session
+texture_average_cache = {}
+texture_cache_loaded = False
+
+
+def texture_cache_path():
+    """Path of the on-disk texture average cache, in the user data folder."""
+    folder = bpy.utils.user_resource('DATAFILES', path="setupauto", create=True)
+    return os.path.join(folder, "texture_averages.json")
+
+
+def load_texture_cache():
+    """Read the on-disk cache into the session cache, once per session."""
+    global texture_cache_loaded
+    if texture_cache_loaded:
+        return
+    texture_cache_loaded = True
+
+    try:
+        with open(texture_cache_path(), "r") as file:
+            texture_average_cache.update({key: tuple(value) for key, value in json.load(file).items()})
+    except FileNotFoundError:
+        pass  # Nothing cached yet, the first save creates the file
+    except (OSError, ValueError) as e:
+        print(f"Texture average cache not loaded: {e}")
+
+
+def save_texture_cache():
+    """Write the session cache to disk."""
+    try:
+        with open(texture_cache_path(), "w") as file:
+            json.dump(texture_average_cache, file)
+    except OSError as e:
+        print(f"Texture average cache not saved: {e}")
+
+
+def image_cache_key(image, max_size=0):
+    """Key identifying an image's pixels: packed data hash, or file path, size and modification time.
+
+    Returns None for images that can change without any of these changing, like generated or
+    painted images, which are then never cached.
+    """
+    if image.is_dirty:
+        return None
+
+    if image.packed_file:
+        source = "packed:" + hashlib.blake2b(image.packed_file.data, digest_size=16).hexdigest()
+    elif image.source == 'FILE':
+        filepath = bpy.path.abspath(image.filepath, library=image.library)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        source = f"file:{os.path.normpath(filepath)}:{stat.st_size}:{stat.st_mtime_ns}"
+    else:
+        return None
+
+    # Averages are scene linear, decoded according to the colorspace. The suffix keeps older
+    # sRGB averages in the disk cache from being read
+    return f"{source}:{max_size}:{image.colorspace_settings.name}:linear"
+
+
+def get_cached_texture_average_rgb(image, max_size=0):
+    """Average RGB of an image, taken from the session or disk cache when the image is unchanged."""
+    if not image:
+        return get_texture_average_rgb(image, max_size)
+
+    load_texture_cache()
+    key = image_cache_key(image, max_size)
+    if key is None:
+        return get_texture_average_rgb(image, max_size)
+
+    if key not in texture_average_cache:
+        texture_average_cache[key] = get_texture_average_rgb(image, max_size)
+    return texture_average_cache[key]
 
 
 def replace_textures_with_rgb(material):
@@ -100,7 +383,7 @@ def replace_textures_with_rgb(material):
     # Replace each texture node with an RGB node
     for tex_node in texture_nodes:
         # Calculate average RGB of the texture
-        avg_rgb = get_texture_average_rgb(tex_node.image)
+        avg_rgb = get_cached_texture_average_rgb(tex_node.image)
         
         # Create new RGB node
         rgb_node = nodes.new(type='ShaderNodeRGB')
@@ -116,35 +399,100 @@ def replace_textures_with_rgb(material):
         nodes.remove(tex_node)
 
 
-def execute():
-    """Main function to create LOD object from selected object."""
+def material_flat_color(material):
+    """Return the single RGBA colour a material is flattened to.
 
-    obj = bpy.context.active_object
-    
-    if not obj:
-        print("No active object selected")
-        return
-    
-    if obj.type != 'MESH':
-        print("Selected object is not a mesh")
-        return
-    
-    duplicate = duplicate_object(obj)
-    
-    # Make new material users
-    make_material_users(duplicate)
-    
-    # Process each material
-    for material in duplicate.data.materials:
-        if material:
-            replace_textures_with_rgb(material)
-    
-    # Select the new LOD object
-    bpy.context.view_layer.objects.active = duplicate
-    duplicate.select_set(True)
-    
-    print(f"Created LOD object: {duplicate.name}")
-    return duplicate
+    Uses the Principled base colour, or the average of the image feeding it, falling back
+    to the viewport display colour.
+    """
+    if material.use_nodes:
+        for node in material.node_tree.nodes:
+            if node.type != 'BSDF_PRINCIPLED':
+                continue
+
+            socket = node.inputs['Base Color']
+            if socket.is_linked:
+                from_node = socket.links[0].from_node
+                if from_node.type == 'TEX_IMAGE' and from_node.image:
+                    return (*get_cached_texture_average_rgb(from_node.image), 1.0)
+                if from_node.type == 'RGB':
+                    return tuple(from_node.outputs[0].default_value)
+            return tuple(socket.default_value)
+
+    return tuple(material.diffuse_color)
+
+
+def make_palette_image(colors, cell_size=4):
+    """Write scene linear colours into a square float palette image, one cell of cell_size pixels each.
+
+    Returns the image and the UV centre of every cell, in the order of colors.
+    """
+    side = max(int(np.ceil(np.sqrt(len(colors)))), 1)
+
+    cells = np.zeros((side * side, 4), dtype=np.float32)
+    cells[:, 3] = 1.0
+    cells[:len(colors)] = np.array(colors, dtype=np.float32).reshape(-1, 4)
+
+    # Blow every cell up to cell_size pixels, rows of the image going up like Blender's pixels
+    pixels = cells.reshape(side, side, 4).repeat(cell_size, axis=0).repeat(cell_size, axis=1)
+
+    # A float image stores the scene linear colours as they are, a byte image would read them as sRGB
+    image = bpy.data.images.new("LOD_Palette", side * cell_size, side * cell_size, alpha=False, float_buffer=True)
+    image.pixels.foreach_set(pixels.ravel())
+    image.pack()
+
+    index = np.arange(len(colors))
+    centres = np.stack([(index % side + 0.5) / side, (index // side + 0.5) / side], axis=1)
+    return image, centres
+
+
+def make_palette_material(image):
+    """Create a material showing a palette image unfiltered through a Principled BSDF."""
+    material = bpy.data.materials.new("LOD_Palette")
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+
+    bsdf = next(node for node in nodes if node.type == 'BSDF_PRINCIPLED')
+    texture = nodes.new(type='ShaderNodeTexImage')
+    texture.image = image
+    texture.interpolation = 'Closest'
+    texture.location = (bsdf.location.x - 300, bsdf.location.y)
+    material.node_tree.links.new(texture.outputs['Color'], bsdf.inputs['Base Color'])
+
+    return material
+
+
+def apply_palette(meshes):
+    """Give LOD meshes one shared palette material, with UVs pointing at each face's colour.
+
+    Every distinct material of the meshes gets one palette cell, so a whole LOD set draws
+    with one material. Returns the palette material.
+    """
+    # Meshes without materials read as one empty slot
+    materials = []
+    for mesh in meshes:
+        materials.extend(material for material in (mesh.materials[:] or [None]) if material not in materials)
+
+    colors = [material_flat_color(material) if material else (0.8, 0.8, 0.8, 1.0) for material in materials]
+    image, centres = make_palette_image(colors)
+    palette_material = make_palette_material(image)
+
+    for mesh in meshes:
+        material_indices = np.zeros(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("material_index", material_indices)
+        loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+
+        # Slot index to palette cell, then every loop takes the cell of its face
+        slot_cells = np.array([materials.index(material) for material in (mesh.materials[:] or [None])], dtype=np.int64)
+        face_cells = slot_cells[np.clip(material_indices, 0, len(slot_cells) - 1)]
+        loop_uvs = centres[np.repeat(face_cells, loop_totals)]
+
+        layer = mesh.uv_layers.new(name="LOD_Palette")
+        layer.data.foreach_set("uv", loop_uvs.astype(np.float32).ravel())
 
+        mesh.materials.clear()
+        mesh.materials.append(palette_material)
+        mesh.polygons.foreach_set("material_index", np.zeros(len(mesh.polygons), dtype=np.int32))
 
-execute()
\ No newline at end of file
+    return palette_material
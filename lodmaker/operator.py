@@ -0,0 +1,150 @@
+import bpy
+
+from . import lodmaker
+
+
+
+class SETUPAUTO_OT_lodmaker(bpy.types.Operator):
+    '''Class creates LOD objects for selected objects'''
+    bl_idname = "setupauto.ot_lodmaker"
+    bl_label = "make LODs"
+    bl_description = "Operator creates a chain of LOD objects for every selected mesh object: decimated levels and a convex hull level with flat colour materials. Objects sharing mesh data share their LOD meshes."
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def lod_collection(self, context, level):
+        """Get or create the collection holding one LOD level, inside a shared LODs collection."""
+        parent = bpy.data.collections.get("LODs")
+        if parent is None:
+            parent = bpy.data.collections.new("LODs")
+        if parent.name not in context.scene.collection.children:
+            context.scene.collection.children.link(parent)
+
+        name = f"LOD{level}"
+        collection = bpy.data.collections.get(name)
+        if collection is None:
+            collection = bpy.data.collections.new(name)
+        if collection.name not in parent.children:
+            parent.children.link(collection)
+        return collection
+
+
+    def level_mesh(self, mesh, ratio, decimated_meshes, material_stats, material_mode):
+        """Get the mesh of one LOD level: the source itself, its decimated copy or a new hull."""
+        if ratio is None:
+            if material_mode == 'PALETTE':
+                return lodmaker.make_hull_mesh(mesh)  # Materials are swapped for the palette once all hulls exist
+            return lodmaker.make_lod_mesh(mesh, material_stats)
+        if ratio >= 1.0:
+            return mesh
+        return decimated_meshes[(mesh, ratio)]
+
+
+    def execute(self, context):
+        lodprops = context.scene.lodmaker_props
+        selected = [obj for obj in context.selected_objects if obj.type == 'MESH']
+
+        if not selected:
+            self.report({'INFO'}, "No mesh objects were selected. Please select objects.")
+            return {'CANCELLED'}
+
+        try:
+            ratios = lodmaker.parse_values(lodprops.lod_ratios)
+            distances = lodmaker.parse_values(lodprops.lod_distances)
+        except ValueError:
+            self.report({'ERROR'}, "LOD ratios and distances must be comma separated numbers.")
+            return {'CANCELLED'}
+
+        # None stands for the hull level
+        levels = [ratio for ratio in ratios if ratio > 0.0] + ([None] if lodprops.use_hull else [])
+        if not levels:
+            self.report({'ERROR'}, "No LOD levels set. Enter ratios or enable the hull level.")
+            return {'CANCELLED'}
+
+        camera = context.scene.camera
+        use_switcher = lodprops.use_switcher
+        if use_switcher and camera is None:
+            self.report({'WARNING'}, "Scene has no camera, LODs are created without a switcher.")
+            use_switcher = False
+        if use_switcher and len(distances) != len(levels):
+            self.report({'ERROR'}, f"{len(levels)} LOD levels need {len(levels)} distances, got {len(distances)}.")
+            return {'CANCELLED'}
+
+        # Objects with modifiers or object linked materials get LODs of what they show, not of their bare mesh
+        base_meshes = lodmaker.make_base_meshes(context, [obj for obj in selected if lodmaker.needs_base_mesh(obj)])
+        sources = {obj: base_meshes.get(obj, obj.data) for obj in selected}
+
+        # Every decimated level of every source mesh comes from one depsgraph evaluation
+        jobs = {(sources[obj], ratio) for obj in selected for ratio in levels if ratio is not None and ratio < 1.0}
+        decimated_meshes = lodmaker.make_decimated_meshes(context, jobs)
+
+        wm = context.window_manager
+        wm.progress_begin(0, len(selected) * len(levels))
+
+        # One LOD mesh per source mesh and level, so instanced sources stay instanced
+        lod_meshes = {}
+        lod_objects = []
+        skipped = set()
+        with_lods = set()
+        material_stats = {'created': 0, 'reused': 0}
+
+        try:
+            for level, ratio in enumerate(levels):
+                collection = self.lod_collection(context, level)
+                near = distances[level] if use_switcher else None
+                far = distances[level + 1] if use_switcher and level + 1 < len(levels) else None
+
+                for i, obj in enumerate(selected):
+                    key = (sources[obj], level)
+                    if key not in lod_meshes:
+                        lod_meshes[key] = self.level_mesh(sources[obj], ratio, decimated_meshes, material_stats, lodprops.material_mode)
+
+                    # Meshes without a convex hull, like empty or edge only meshes, get no hull level
+                    if lod_meshes[key] is None:
+                        skipped.add(obj.name)
+                        continue
+
+                    lod_object = bpy.data.objects.new(f"{obj.name}_LOD{level}", lod_meshes[key])
+                    lod_object.matrix_world = obj.matrix_world.copy()
+                    collection.objects.link(lod_object)
+                    lod_objects.append(lod_object)
+                    with_lods.add(obj)
+
+                    if use_switcher:
+                        lodmaker.add_distance_switcher(lod_object, camera, near, far)
+
+                    wm.progress_update(level * len(selected) + i + 1)
+        finally:
+            wm.progress_end()
+
+        if skipped:
+            self.report({'WARNING'}, f"Skipped the hull level of {len(skipped)} objects without a convex hull, like empty or edge only meshes: {', '.join(sorted(skipped)[:10])}.")
+
+        if lodprops.use_hull and lodprops.material_mode == 'PALETTE':
+            hull_meshes = [mesh for (_, level), mesh in lod_meshes.items() if levels[level] is None and mesh is not None]
+            if hull_meshes:
+                palette_material = lodmaker.apply_palette(hull_meshes)
+                material_stats['created'] += 1
+                material_stats['reused'] += len(hull_meshes) - 1
+                self.report({'INFO'}, f"Hull level uses palette material {palette_material.name}.")
+
+        lodmaker.save_texture_cache()
+
+        # Baked meshes only stay where a full detail level uses them
+        bpy.data.batch_remove([mesh for mesh in base_meshes.values() if mesh.users == 0])
+        if base_meshes:
+            self.report({'INFO'}, f"Baked modifiers and object materials of {len(base_meshes)} objects into their LODs.")
+
+        # The LOD chain replaces the originals on screen, the first level takes their place
+        if use_switcher:
+            for obj in with_lods:
+                obj.hide_viewport = True
+                obj.hide_render = True
+
+        bpy.ops.object.select_all(action='DESELECT')
+        for lod_object in lod_objects:
+            if lod_object.visible_get():
+                lod_object.select_set(True)
+
+        self.report({'INFO'}, f"Created {len(lod_objects)} LOD objects in {len(levels)} levels from {len(selected)} objects. "
+                    f"LOD materials: {material_stats['created']} created, {material_stats['reused']} reused.")
+        return {'FINISHED'}
@@ -0,0 +1,38 @@
+import bpy
+
+
+
+class SETUPAUTO_PG_lodmaker_props (bpy.types.PropertyGroup):
+    lod_ratios : bpy.props.StringProperty(
+        name = "LOD Ratios",
+        description = "Comma separated decimation ratios, one LOD level each. 1.0 reuses the original mesh.",
+        default = "1.0, 0.5, 0.1"
+    )
+
+    use_hull : bpy.props.BoolProperty(
+        name = "Hull Level",
+        description = "Add a last LOD level made of the convex hull with flat colour materials.",
+        default = True
+    )
+
+    material_mode : bpy.props.EnumProperty(
+        name = "Hull Materials",
+        description = "How the hull level shows the colours of the original materials.",
+        items = [
+            ('COPY', "Flat Copies", "One flat colour copy of every original material, shared between LODs"),
+            ('PALETTE', "Palette", "One material for the whole LOD set, reading flat colours from a palette texture through UVs")
+        ],
+        default = 'COPY'
+    )
+
+    lod_distances : bpy.props.StringProperty(
+        name = "LOD Distances",
+        description = "Comma separated camera distances at which each LOD level starts, one per level including the hull level.",
+        default = "0, 20, 60, 150"
+    )
+
+    use_switcher : bpy.props.BoolProperty(
+        name = "Camera Switcher",
+        description = "Add drivers showing only the LOD level matching the distance to the scene camera, and hide the original objects.",
+        default = True
+    )
@@ -0,0 +1,24 @@
+import bpy
+
+
+
+class SETUPAUTO_PT_lodmaker_panel(bpy.types.Panel):
+    '''Class draws LOD maker UI panel'''
+    bl_idname = "setupauto.pt_lodmaker_panel"
+    bl_label = "LOD Maker Settings"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "SetupAuto"
+
+    def draw(self, context):
+        layout = self.layout
+        lodprops = context.scene.lodmaker_props
+
+        boxLOD = layout.box()
+        columnLOD = boxLOD.column(align=True)
+        columnLOD.prop(lodprops, "lod_ratios", text = "Ratios")
+        columnLOD.prop(lodprops, "use_hull", toggle = True)
+        columnLOD.prop(lodprops, "material_mode", text = "")
+        columnLOD.prop(lodprops, "lod_distances", text = "Distances")
+        columnLOD.prop(lodprops, "use_switcher", toggle = True)
+        columnLOD.operator('setupauto.ot_lodmaker', text = "Make LODs")
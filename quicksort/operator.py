@@ -1,5 +1,7 @@
 import bpy
 
+from ..Tools import meshjoin
+
 
 
 class SETUPAUTO_OT_quicksort(bpy.types.Operator):
@@ -87,11 +89,16 @@ class SETUPAUTO_OT_quicksort(bpy.types.Operator):
             
         collection = self.get_collection(context, pattern_entry)
         
-        bpy.context.view_layer.objects.active = selected_objects[0]
-        
-        bpy.ops.object.join()
-        
-        joined_object = bpy.context.active_object
+        if context.scene.quicksort_props.join_method == 'DATA':
+            # Join mesh data directly, without running the join operator per pattern
+            meshes = [obj for obj in selected_objects if obj.type == 'MESH']
+            joined = meshjoin.join_clusters([meshes])
+            joined_object = joined[0] if joined else None
+        else:
+            bpy.context.view_layer.objects.active = selected_objects[0]
+            bpy.ops.object.join()
+            joined_object = bpy.context.active_object
+
         if joined_object:
             originalCollection = joined_object.users_collection[0]
             originalCollection.objects.unlink(joined_object)
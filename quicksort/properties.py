@@ -12,6 +12,16 @@ class SETUPAUTO_PG_quicksort_props (bpy.types.PropertyGroup):
         type = bpy.types.Collection
     )
 
+    join_method : bpy.props.EnumProperty(
+        name = "Join Method",
+        description = "How objects matching a Join pattern are joined.",
+        items = [
+        ('OPERATOR', "Operator", "Run Blender's join operator, keeping all mesh data"),
+        ('DATA', "Data (Lossy)", "Merge mesh data directly, much faster on large selections. Drops vertex groups, custom normals, color and other attributes, seams, sharp edges and creases"),
+        ],
+        default = 'OPERATOR'
+    )
+
 
 #===================================
     # --- Property Group -> Collection Property ---
@@ -77,6 +77,7 @@ class SETUPAUTO_PT_quicksort_panel(bpy.types.Panel):
         if quicksort_props.main_collection == None:
             rowInfo = boxSort.row()
             rowInfo.label(text = " You must assign a main collection!", icon = 'INFO')
+        boxSort.prop(quicksort_props, "join_method", text = "")
 
 
         rowSort = boxSort.row(align = True)